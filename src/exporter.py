@@ -1,60 +1,96 @@
 import argparse
+import itertools
+import json
 import re
+import time
 
-from typing import List, Optional
-from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
 from pathlib import Path
 
 from sql import Database, Paper
 
 
+# Write buffer for exported files, large enough to amortize per-write syscalls
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Markdown bold/underline markers stripped from generated summaries in one pass
+_MD_EMPHASIS_RE = re.compile(r'\*\*|__')
+
+# Section tags emitted by the summarization prompt, e.g. "[TL;DR:]", mapped to section names
+_SECTION_TAG_RE = re.compile(r'\[(topics|tl;dr|summary):\]', re.IGNORECASE)
+_SECTION_NAMES = {
+    'topics': 'topics',
+    'tl;dr': 'tldr',
+    'summary': 'summary',
+}
+
+
+def _sort_by_title(papers: Iterable[Paper]) -> List[Paper]:
+    """Sort papers case-insensitively by title."""
+    # sorted() evaluates the key once per paper, so each title is case-folded exactly once
+    return sorted(papers, key=lambda paper: paper.title.casefold())
+
+
+def _iter_sorted_papers(db: Database, filters: Optional[dict] = None) -> Iterator[Paper]:
+    """Stream papers from the database sorted by title, raising if none match the filters."""
+    # Exporters only show these columns, so the papers' full texts are not read
+    papers = db.iter_papers(filters, order_by_title=True, columns=['title', 'summary', 'pdf_url'])
+    first = next(papers, None)
+    if first is None:
+        raise ValueError("No papers found in the database with the given filters")
+    return itertools.chain([first], papers)
+
+
+def _iter_sections(summary: str):
+    """Yield (section_name, text) pairs for the tagged sections of a generated summary."""
+    clean_summary = _MD_EMPHASIS_RE.sub('', summary)
+    # Each section runs until the next tag, so brackets inside the text (e.g. citations) are kept
+    tags = list(_SECTION_TAG_RE.finditer(clean_summary))
+    for tag, next_tag in zip(tags, tags[1:] + [None]):
+        end = next_tag.start() if next_tag else len(clean_summary)
+        yield _SECTION_NAMES[tag.group(1).lower()], clean_summary[tag.end():end].strip()
+
+
 class MarkdownExporter:
+    SECTION_FORMATS = {
+        'topics': "### Topics\n\n{}\n\n",
+        'tldr': "### TL;DR\n\n{}\n\n",
+        'summary': "### Summary\n\n{}\n\n",
+    }
+
     def __init__(self, db: Database):
         self.db = db
 
     def generate_markdown(self, papers: List[Paper], title: str = "Research Paper Summaries") -> str:
         """Generate markdown content from a list of papers."""
-        # Sort papers by title
-        papers = sorted(papers, key=lambda x: x.title.lower())
+        return ''.join(self.iter_markdown(papers, title))
+
+    def iter_markdown(self, papers: Iterable[Paper], title: str = "Research Paper Summaries", sort: bool = True) -> Iterator[str]:
+        """Yield markdown content for papers, one chunk per paper after the header."""
+        # Sort papers by title unless they are already sorted
+        if sort:
+            papers = _sort_by_title(papers)
         
-        md_content = f"# {title}\n\n"
-        md_content += f"*Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} by [PubSummarizer](https://github.com/Logan-Lin/PubSummarizer)*\n\n"
+        generated_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        yield f"# {title}\n\n*Generated on {generated_at} by [PubSummarizer](https://github.com/Logan-Lin/PubSummarizer)*\n\n"
 
         for paper in papers:
-            md_content += self._format_paper(paper)
-
-        return md_content
+            yield self._format_paper(paper)
 
     def _format_paper(self, paper: Paper) -> str:
         """Format a single paper into markdown."""
-        md_text = f"## {paper.title}\n\n"
+        parts = [f"## {paper.title}\n\n"]
         
         if paper.summary:
-            # Split summary into topics and main summary
-            clean_summary = paper.summary.replace('**', '').replace('__', '')
-            
             # Extract topics, TL;DR, and summary sections
-            sections = clean_summary.split('[')
-            for section in sections:
-                section_lower = section.lower()
-                if section_lower.startswith('topics:]'):
-                    topics = re.sub(r'(?i)Topics:]', '', section).strip()
-                    md_text += "### Topics\n\n"
-                    md_text += f"{topics}\n\n"
-                elif section_lower.startswith('tl;dr:]'):
-                    tldr = re.sub(r'(?i)TL;DR:]', '', section).strip()
-                    md_text += "### TL;DR\n\n"
-                    md_text += f"{tldr}\n\n"
-                elif section_lower.startswith('summary:]'):
-                    summary = re.sub(r'(?i)Summary:]', '', section).strip()
-                    md_text += "### Summary\n\n"
-                    md_text += f"{summary}\n\n"
+            for name, text in _iter_sections(paper.summary):
+                parts.append(self.SECTION_FORMATS[name].format(text))
 
         if paper.pdf_url:
-            md_text += f"**Paper URL**: [{paper.pdf_url}]({paper.pdf_url})\n\n"
+            parts.append(f"**Paper URL**: [{paper.pdf_url}]({paper.pdf_url})\n\n")
         
-        md_text += "---\n\n"
-        return md_text
+        parts.append("---\n\n")
+        return ''.join(parts)
 
     def export_to_file(self, output_path: str, filters: Optional[dict] = None, title: str = "Research Paper Summaries") -> None:
         """
@@ -65,80 +101,63 @@ class MarkdownExporter:
             filters: Optional filters to apply when querying papers
             title: Custom title for the markdown document
         """
-        papers = self.db.get_papers(filters)
-        
-        if not papers:
-            raise ValueError("No papers found in the database with the given filters")
-
-        # Generate markdown content with custom title
-        md_content = self.generate_markdown(papers, title)
+        papers = _iter_sorted_papers(self.db, filters)
 
         # Ensure the output directory exists
         output_file = Path(output_path)
         output_file.parent.mkdir(parents=True, exist_ok=True)
 
-        # Write to file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(md_content)
+        # Write markdown content with custom title to file as it is generated
+        with open(output_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            f.writelines(self.iter_markdown(papers, title, sort=False))
 
 
 class ObsidianExporter:
+    SECTION_FORMATS = {
+        'tldr': "#### TL;DR\n\n{}\n\n",
+        'summary': "#### Summary\n\n{}\n\n",
+    }
+
     def __init__(self, db: Database):
         self.db = db
 
     def generate_markdown(self, papers: List[Paper], title: str = "Research Paper Summaries") -> str:
         """Generate Obsidian-style markdown content from a list of papers."""
-        # Sort papers by title
-        papers = sorted(papers, key=lambda x: x.title.lower())
+        return ''.join(self.iter_markdown(papers, title))
 
-        md_content = "---\n"
-        md_content += f"title: {title}\n"
-        md_content += "---\n\n"
+    def iter_markdown(self, papers: Iterable[Paper], title: str = "Research Paper Summaries", sort: bool = True) -> Iterator[str]:
+        """Yield Obsidian-style markdown content for papers, one chunk per paper after the header."""
+        # Sort papers by title unless they are already sorted
+        if sort:
+            papers = _sort_by_title(papers)
 
-        md_content += f"*Generated by [PubSummarizer](https://github.com/Insights-Ac/PubSummarizer)*\n\n"
+        yield f"---\ntitle: {title}\n---\n\n*Generated by [PubSummarizer](https://github.com/Insights-Ac/PubSummarizer)*\n\n"
 
         for paper in papers:
-            md_content += self._format_paper(paper)
-
-        return md_content
+            yield self._format_paper(paper)
 
     def _format_paper(self, paper: Paper) -> str:
         """Format a single paper into Obsidian-style markdown."""
         # Main content
-        md_text = "---\n\n"
-
-        md_text += f"### {paper.title}\n\n"
+        parts = ["---\n\n", f"### {paper.title}\n\n"]
         
         if paper.summary:
-            # Split summary into topics and main summary
-            clean_summary = paper.summary.replace('**', '').replace('__', '')
-
             # Process each section
-            sections = clean_summary.split('[')
-            for section in sections:
-                section_lower = section.lower()
-                if section_lower.startswith('topics:]'):
-                    topics = re.sub(r'(?i)Topics:]', '', section).strip()
-                    topic_list = [t.strip() for t in topics.split(',')]
-                    md_text += "**Topics:** "
+            for name, text in _iter_sections(paper.summary):
+                if name == 'topics':
+                    topic_list = [t.strip() for t in text.split(',')]
                     topic_tags = []
                     for topic in topic_list:
                         topic_clean = topic.replace(' ', '-').replace('\'', '')
                         topic_tags.append(f"#{topic_clean.lower()}")
-                    md_text += ", ".join(topic_tags) + "\n\n"
-                elif section_lower.startswith('tl;dr:]'):
-                    tldr = re.sub(r'(?i)TL;DR:]', '', section).strip()
-                    md_text += "#### TL;DR\n\n"
-                    md_text += f"{tldr}\n\n"
-                elif section_lower.startswith('summary:]'):
-                    summary = re.sub(r'(?i)Summary:]', '', section).strip()
-                    md_text += "#### Summary\n\n"
-                    md_text += f"{summary}\n\n"
+                    parts.append(f"**Topics:** {', '.join(topic_tags)}\n\n")
+                else:
+                    parts.append(self.SECTION_FORMATS[name].format(text))
 
         if paper.pdf_url:
-            md_text += f"📄 [Paper Link]({paper.pdf_url})\n\n"
+            parts.append(f"📄 [Paper Link]({paper.pdf_url})\n\n")
         
-        return md_text
+        return ''.join(parts)
 
     def export_to_file(self, output_path: str, filters: Optional[dict] = None, title: str = "Research Paper Summaries") -> None:
         """
@@ -149,57 +168,17 @@ class ObsidianExporter:
             filters: Optional filters to apply when querying papers
             title: Custom title for the markdown document
         """
-        papers = self.db.get_papers(filters)
-        
-        if not papers:
-            raise ValueError("No papers found in the database with the given filters")
-
-        md_content = self.generate_markdown(papers, title)
+        papers = _iter_sorted_papers(self.db, filters)
 
         output_file = Path(output_path)
         output_file.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(md_content)
+        with open(output_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            f.writelines(self.iter_markdown(papers, title, sort=False))
 
 
-class WebExporter:
-    def __init__(self, db: Database):
-        self.db = db
-        
-    def generate_html(self, papers: List[Paper], title: str = "Research Paper Summaries") -> str:
-        """Generate HTML content from a list of papers."""
-        # Sort papers by title
-        papers = sorted(papers, key=lambda x: x.title.lower())
-        
-        # Convert papers to JSON-friendly format
-        papers_data = []
-        for paper in papers:
-            paper_dict = {
-                "title": paper.title,
-                "pdf_url": paper.pdf_url,
-                "topics": [],
-                "tldr": "",
-                "summary": ""
-            }
-            
-            if paper.summary:
-                clean_summary = paper.summary.replace('**', '').replace('__', '')
-                sections = clean_summary.split('[')
-                
-                for section in sections:
-                    section_lower = section.lower()
-                    if section_lower.startswith('topics:]'):
-                        topics = re.sub(r'(?i)Topics:]', '', section).strip()
-                        paper_dict["topics"] = [t.strip() for t in topics.split(',')]
-                    elif section_lower.startswith('tl;dr:]'):
-                        paper_dict["tldr"] = re.sub(r'(?i)TL;DR:]', '', section).strip()
-                    elif section_lower.startswith('summary:]'):
-                        paper_dict["summary"] = re.sub(r'(?i)Summary:]', '', section).strip()
-            
-            papers_data.append(paper_dict)
-
-        html_content = """
+# Page template for WebExporter; literal braces are doubled for str.format_map
+_HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -294,6 +273,16 @@ class WebExporter:
             }});
         }}
         
+        // Function to escape text inserted into HTML, the papers data holds raw text
+        function escapeHtml(text) {{
+            return String(text)
+                .replace(/&/g, '&amp;')
+                .replace(/</g, '&lt;')
+                .replace(/>/g, '&gt;')
+                .replace(/"/g, '&quot;')
+                .replace(/'/g, '&#x27;');
+        }}
+        
         // Function to create paper card HTML
         function createPaperCard(paper) {{
             const showTopics = document.getElementById('showTopics').checked;
@@ -303,7 +292,7 @@ class WebExporter:
             const topicsHtml = (showTopics && paper.topics.length > 0)
                 ? `<div class="mb-3">
                      <div class="d-flex gap-2 flex-wrap">
-                       ${{paper.topics.map(topic => `<span class="badge text-bg-info">${{topic}}</span>`).join('')}}
+                       ${{paper.topics.map(topic => `<span class="badge text-bg-info">${{escapeHtml(topic)}}</span>`).join('')}}
                      </div>
                    </div>`
                 : '';
@@ -311,26 +300,26 @@ class WebExporter:
             const tldrHtml = (showTldr && paper.tldr)
                 ? `<div class="mb-3">
                      <h3 class="h5">TL;DR</h3>
-                     <p class="card-text">${{paper.tldr}}</p>
+                     <p class="card-text">${{escapeHtml(paper.tldr)}}</p>
                    </div>`
                 : '';
                 
             const summaryHtml = (showSummary && paper.summary)
                 ? `<div class="mb-3">
                      <h3 class="h5">Summary</h3>
-                     <p class="card-text">${{paper.summary}}</p>
+                     <p class="card-text">${{escapeHtml(paper.summary)}}</p>
                    </div>`
                 : '';
                 
             const urlHtml = paper.pdf_url
-                ? `<p class="card-text"><a href="${{paper.pdf_url}}" class="btn btn-outline-primary btn-sm">Download Paper</a></p>`
+                ? `<p class="card-text"><a href="${{escapeHtml(paper.pdf_url)}}" class="btn btn-outline-primary btn-sm">Download Paper</a></p>`
                 : '';
                 
             return `
                 <div class="col-sm-12 col-lg-6 col-xl-4 mb-4">
                     <div class="card shadow-sm">
                         <div class="card-body">
-                            <h3 class="card-title h4">${{paper.title}}</h3>
+                            <h3 class="card-title h4">${{escapeHtml(paper.title)}}</h3>
                             ${{topicsHtml}}
                             ${{tldrHtml}}
                             ${{summaryHtml}}
@@ -473,12 +462,58 @@ class WebExporter:
 </body>
 </html>
 """
-        import json
-        return html_content.format(
-            title=title,
-            date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            papers_json=json.dumps(papers_data)
-        )
+_HTML_HEAD, _HTML_TAIL = _HTML_TEMPLATE.split('{papers_json}')
+
+
+class WebExporter:
+    def __init__(self, db: Database):
+        self.db = db
+        
+    def generate_html(self, papers: List[Paper], title: str = "Research Paper Summaries") -> str:
+        """Generate HTML content from a list of papers."""
+        return ''.join(self.iter_html(papers, title))
+
+    def iter_html(self, papers: Iterable[Paper], title: str = "Research Paper Summaries", sort: bool = True) -> Iterator[str]:
+        """Yield HTML content for papers, serializing one paper per chunk."""
+        # Sort papers by title unless they are already sorted
+        if sort:
+            papers = _sort_by_title(papers)
+
+        yield _HTML_HEAD.format_map({
+            'title': title,
+            'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+
+        # Embed the papers as a JSON array, one element at a time
+        yield '['
+        for i, paper in enumerate(papers):
+            if i:
+                yield ', '
+            # Escape "<" so text such as "</script>" cannot end the inline script early
+            yield json.dumps(self._paper_data(paper)).replace('<', '\\u003c')
+        yield ']'
+
+        yield _HTML_TAIL.format_map({})
+
+    def _paper_data(self, paper: Paper) -> dict:
+        """Convert a single paper to a JSON-friendly dict."""
+        # Text stays raw so it can be searched, the page escapes it when rendering the cards
+        paper_dict = {
+            "title": paper.title,
+            "pdf_url": paper.pdf_url,
+            "topics": [],
+            "tldr": "",
+            "summary": ""
+        }
+        
+        if paper.summary:
+            for name, text in _iter_sections(paper.summary):
+                if name == 'topics':
+                    paper_dict["topics"] = [t.strip() for t in text.split(',')]
+                else:
+                    paper_dict[name] = text
+        
+        return paper_dict
 
     def export_to_file(self, output_path: str, filters: Optional[dict] = None, title: str = "Research Paper Summaries") -> None:
         """
@@ -489,18 +524,13 @@ class WebExporter:
             filters: Optional filters to apply when querying papers
             title: Custom title for the HTML page
         """
-        papers = self.db.get_papers(filters)
-        
-        if not papers:
-            raise ValueError("No papers found in the database with the given filters")
-
-        html_content = self.generate_html(papers, title)
+        papers = _iter_sorted_papers(self.db, filters)
 
         output_file = Path(output_path)
         output_file.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        with open(output_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            f.writelines(self.iter_html(papers, title, sort=False))
 
 
 def export_papers(db_url: str, output_path: str, format: str = 'markdown', filters: Optional[dict] = None, title: str = "Research Paper Summaries") -> None:
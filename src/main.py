@@ -4,12 +4,49 @@ import re
 import time
 import yaml
 import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from urllib.parse import urlparse
 from tqdm import tqdm
 
-from pdf_parser import parse_pdf, clean_text, download_pdf
+from pdf_parser import parse_pdf_cached, clean_text, download_pdf, is_complete_pdf
 from pdf_scraper import scrape_openreview, scrape_ai_conference, scrape_cvpr
 from sql import Database, Paper
-from summarizer import summarize_text
+from summarizer import summarize_texts, build_prompt, truncate_text, unload_model, TRANSPORT_PARAMS
+
+
+class Throttle:
+    """Enforce a minimum delay between calls sharing the same key across threads."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, key):
+        # Reserve the next free slot for this key, then sleep outside the lock
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(key, now))
+            self.next_slot[key] = slot + self.delay
+        time.sleep(slot - now)
+
+
+class HostLimit:
+    """Bound the number of concurrent calls sharing the same key across threads."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.semaphores = {}
+
+    def __call__(self, key):
+        # Create each key's semaphore under the lock, so threads racing on a new key share one
+        with self.lock:
+            if key not in self.semaphores:
+                self.semaphores[key] = threading.BoundedSemaphore(self.limit)
+            return self.semaphores[key]
 
 
 def get_db_url():
@@ -31,61 +68,83 @@ def get_db_url():
         return os.getenv('DB_URL', 'sqlite:///data/papers.db')
 
 
-def scrape_papers(config):
+def make_paper_id(source_id):
+    """Create a unique, filename-safe paper ID from the scraper's source ID."""
+    # IDs are primary keys of previously stored papers, so the hash function must stay stable
+    return hashlib.sha256(source_id.encode('utf-8')).hexdigest()
+
+
+def make_summary_key(provider, model_name, prompt, param):
+    """Create a cache key identifying a summary by everything that determines the model's output."""
+    key = json.dumps([provider.lower(), model_name, prompt, param], sort_keys=True, default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def add_entries(db, papers):
+    """Add a batch of papers to the database, falling back to one-by-one inserts on failure."""
+    if not papers:
+        return
+    try:
+        db.add_entries(papers)
+    except Exception:
+        for paper in papers:
+            try:
+                db.add_entry(paper)
+            except Exception as e:
+                print(f"Error adding entry to the database: {e}")
+
+
+def scrape_papers(config, db):
     """Scrape papers and store their content in the database without summarization."""
     name = config.get('name', 'Unnamed config')
     print(f"\nScraping papers for configuration: {name}", flush=True)
     
     # Extract parameters from config
+    scraping = config['scraping']
     output_dir = config['paths']['output_dir']
-    db_path = config['paths'].get('db_path', get_db_url())
-    platform = config['scraping']['platform']
-    
-    # Initialize database
-    db = Database(db_path)
-    db.create_tables()
+    parse_cache_dir = config['paths'].get('parse_cache_dir', os.path.join(output_dir, 'parse_cache'))
+    scrape_cache_dir = config['paths'].get('scrape_cache_dir', os.path.join(output_dir, 'scrape_cache'))
+    platform = scraping['platform']
+    enforce_rescrape = scraping.get('enforce_rescrape', False)
+    use_pypdf2 = scraping.get('use_pypdf2', True)
+    ocr_dpi = scraping.get('ocr_dpi', 150)
+    strip_latexit = scraping.get('strip_latexit', False)
+    join_hyphens = scraping.get('join_hyphens', False)
+    cap_at = scraping.get('cap_at')
+    commit_every = scraping.get('commit_every', 20)
+    if not scraping.get('use_scrape_cache', True):
+        scrape_cache_dir = None
     
     # Create output directory if it doesn't exist
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    # Scrape PDF URLs based on platform
-    if platform.lower() == 'openreview':
-        papers = scrape_openreview(**config['scraping']['scraper_params'])
-    elif platform.lower() == 'ai_conference':
-        papers = scrape_ai_conference(**config['scraping']['scraper_params'])
-    elif platform.lower() == 'cvpr':
-        papers = scrape_cvpr(**config['scraping']['scraper_params'])
-    else:
-        raise ValueError(f"Unsupported platform: {platform}")
-    
-    # Process each paper
-    for paper_id, title, url in tqdm(papers, desc="Scraping papers"):
-        # Create a unique ID using SHA-256 hash
-        paper_id = hashlib.sha256(paper_id.encode()).hexdigest()
-        title = clean_text(title)
-
-        # Check if the paper already exists in the database
-        existing_papers = db.get_papers(filters={'id': paper_id})
-        if existing_papers:
-            if config['scraping'].get('enforce_rescrape', False) or not existing_papers[0].content:
-                db.delete_paper(paper_id)
-            else:
-                print(f"Skipping {title}, already scraped.")
-                continue
-        
-        # Download PDF
-        pdf_path = download_pdf(f'{paper_id}.pdf', url, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Delay between downloads from the same host to avoid overwhelming the server
+    throttle = Throttle(scraping['delay'])
+    # Cap parallel downloads per host, so many download workers do not all hit one server at once
+    host_limit = HostLimit(scraping.get('downloads_per_host', 4))
+    downloads = {}
+
+    def download(paper_id, url):
+        # Download PDF, only throttling requests that actually hit the server
+        if is_complete_pdf(os.path.join(output_dir, f'{paper_id}.pdf')):
+            return download_pdf(f'{paper_id}.pdf', url, output_dir)
+        host = urlparse(url).netloc
+        with host_limit(host):
+            throttle.wait(host)
+            return download_pdf(f'{paper_id}.pdf', url, output_dir)
+
+    def process(paper_id, title, url, pdf_download):
+        pdf_path = pdf_download.result()
         if not pdf_path:
             print(f"Failed to download {title}.")
-            continue
+            return None
         
-        # Parse and clean PDF
-        raw_content = parse_pdf(pdf_path, use_pypdf2=config['scraping'].get('use_pypdf2', True))
-        content = clean_text(raw_content)
+        # Parse and clean PDF, reusing the cached text if this PDF was parsed before
+        content = parse_pdf_cached(pdf_path, parse_cache_dir, use_pypdf2=use_pypdf2, ocr_dpi=ocr_dpi,
+                                   strip_latexit=strip_latexit, join_hyphens=join_hyphens, cap_at=cap_at)
 
         # Create or update Paper entry
-        paper_entry = Paper(
+        return Paper(
             id=paper_id,
             collection=name,
             title=title,
@@ -95,58 +154,252 @@ def scrape_papers(config):
             content=content,
             summary=None  # Summary will be added later
         )
-        
-        # Add entry to the database
+
+    # Downloads run in their own pool, so they overlap with scraping and slow parses (e.g. OCR)
+    # do not hold up the network
+    # Papers of this collection that are already stored with content are skipped below, so they are not prefetched
+    if enforce_rescrape:
+        scraped_ids = set()
+    else:
+        scraped_ids = {paper.id for paper in db.get_papers(filters={'collection': name}, columns=['id', 'has_content'])
+                       if paper.has_content}
+
+    with ThreadPoolExecutor(max_workers=scraping.get('download_workers', 8)) as downloader:
         try:
-            db.add_entry(paper_entry)
-        except Exception as e:
-            print(f"Error adding entry to the database: {e}")
+            def prefetch(source_id, title, url):
+                # Start downloading each paper as soon as the scraper finds it
+                paper_id = make_paper_id(source_id)
+                if paper_id not in downloads and paper_id not in scraped_ids:
+                    downloads[paper_id] = downloader.submit(download, paper_id, url)
+
+            on_paper = prefetch if scraping.get('prefetch_downloads', True) else None
+
+            # Scrape PDF URLs based on platform
+            if platform.lower() == 'openreview':
+                papers = scrape_openreview(**scraping['scraper_params'], on_paper=on_paper)
+            elif platform.lower() == 'ai_conference':
+                papers = scrape_ai_conference(**scraping['scraper_params'], cache_dir=scrape_cache_dir,
+                                              on_paper=on_paper)
+            elif platform.lower() == 'cvpr':
+                papers = scrape_cvpr(**scraping['scraper_params'], cache_dir=scrape_cache_dir, on_paper=on_paper)
+            else:
+                raise ValueError(f"Unsupported platform: {platform}")
         
-        # Delay to avoid overwhelming the server
-        time.sleep(config['scraping']['delay'])
+            papers = [(make_paper_id(paper_id), title, url) for paper_id, title, url in papers]
 
+            # Look up all papers that already exist in the database with a single query
+            # Only whether they have content is needed, so the stored texts themselves are not read
+            existing = db.get_papers_by_ids([paper_id for paper_id, _, _ in papers], columns=['has_content'])
+            seen = set()
+            to_delete = []
+            to_process = []
 
-def summarize_papers(config):
+            for paper_id, title, url in papers:
+                title = clean_text(title)
+
+                if paper_id in seen:
+                    print(f"Skipping {title}, duplicate entry.")
+                    continue
+                seen.add(paper_id)
+
+                # Check if the paper already exists in the database
+                existing_paper = existing.get(paper_id)
+                if existing_paper:
+                    if enforce_rescrape or not existing_paper.has_content:
+                        to_delete.append(paper_id)
+                    else:
+                        print(f"Skipping {title}, already scraped.")
+                        # Stop a prefetched download that has not started yet, e.g. of a paper stored by
+                        # another collection
+                        if paper_id in downloads:
+                            downloads[paper_id].cancel()
+                        continue
+
+                to_process.append((paper_id, title, url))
+
+            # Remove the outdated entries of papers being rescraped in a single transaction
+            db.delete_papers(to_delete)
+
+            # Parse papers concurrently, writing to the database from this thread only
+            pending = []
+            with ThreadPoolExecutor(max_workers=scraping.get('workers', 4)) as executor:
+                futures = []
+                for paper_id, title, url in to_process:
+                    pdf_download = downloads.get(paper_id) or downloader.submit(download, paper_id, url)
+                    futures.append(executor.submit(process, paper_id, title, url, pdf_download))
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Scraping papers"):
+                    try:
+                        paper_entry = future.result()
+                    except Exception as e:
+                        print(f"Error processing paper: {e}")
+                        continue
+                    if paper_entry is None:
+                        continue
+
+                    # Queue entry and write to the database in batches
+                    pending.append(paper_entry)
+                    if len(pending) >= commit_every:
+                        add_entries(db, pending)
+                        pending = []
+
+            add_entries(db, pending)
+        except BaseException:
+            # Leaving the pool waits for its downloads, so drop the queued ones to surface errors,
+            # e.g. a scraper timeout or Ctrl-C, without first downloading every prefetched paper
+            downloader.shutdown(cancel_futures=True)
+            raise
+
+
+def summarize_papers(config, db):
     """Summarize papers that have content but no summary in the database."""
     name = config.get('name', 'Unnamed config')
     print(f"\nSummarizing papers for configuration: {name}", flush=True)
     
-    # Initialize database
-    db = Database(config['paths'].get('db_path', get_db_url()))
-    
-    # Get papers based on enforce_resummary setting
-    if config['summarization'].get('enforce_resummary', False):
+    # Extract parameters from config
+    summarization = config['summarization']
+    provider = summarization['provider']
+    model_name = summarization['model_name']
+    prefix, suffix = summarization['prefix'], summarization['suffix']
+    cap_at, content_cap = summarization['cap_at'], summarization['content_cap']
+    max_input_tokens = summarization.get('max_input_tokens')
+    param = summarization['param']
+    commit_every = summarization.get('commit_every', 20)
+    quantization = summarization.get('quantization')
+    model_kwargs = summarization.get('model_kwargs')
+    # Quantized weights and loading options change the output, so they are part of what identifies a
+    # cached summary, while options of how requests are sent (e.g. streaming) do not
+    key_param = {key: value for key, value in param.items() if key not in TRANSPORT_PARAMS}
+    if quantization:
+        key_param['quantization'] = quantization
+    if model_kwargs:
+        key_param['model_kwargs'] = model_kwargs
+
+    # Stream papers based on enforce_resummary setting, instead of loading all their texts at once
+    enforce_resummary = summarization.get('enforce_resummary', False)
+    if enforce_resummary:
         # Get all papers with content, regardless of summary status
-        papers = db.get_papers(filters={'collection': name})
+        filters = {'collection': name}
     else:
         # Get only papers with content but no summary
-        papers = db.get_papers(filters={'collection': name, 'summary': None})
+        filters = {'collection': name, 'summary': None}
+    papers = db.iter_papers(filters, columns=['id', 'title', 'content'])
     
-    for paper in tqdm(papers, desc="Summarizing papers"):
+    # Delay between API calls if specified
+    throttle = Throttle(summarization.get('delay', 0))
+
+    def prepare(paper):
         content = paper.content
 
-        if config['summarization']['cap_at'] and config['summarization']['cap_at'] in content:
-            content = content[:content.index(config['summarization']['cap_at'])]
+        if cap_at and cap_at in content:
+            content = content[:content.index(cap_at)]
+
+        if content_cap:
+            content = content[:content_cap]
 
-        if config['summarization']['content_cap']:
-            content = content[:config['summarization']['content_cap']]
+        # Bound the tokens sent to the model, which is what API providers charge for
+        if max_input_tokens:
+            content = truncate_text(content, max_input_tokens, provider, model_name)
 
-        # Summarize the content
-        summary = summarize_text(
-            prefix=config['summarization']['prefix'],
-            suffix=config['summarization']['suffix'],
-            text=content,
-            provider=config['summarization']['provider'],
-            model_name=config['summarization']['model_name'],
-            **config['summarization']['param']
+        return content
+
+    def process(contents):
+        # Summarize the contents
+        throttle.wait(provider)
+        return summarize_texts(
+            prefix=prefix,
+            suffix=suffix,
+            texts=contents,
+            provider=provider,
+            model_name=model_name,
+            quantization=quantization,
+            model_kwargs=model_kwargs,
+            batch_size=batch_size,
+            openai_batch=openai_batch,
+            **param
         )
-        
-        # Update the paper with the summary
-        db.update_paper(paper.id, {'summary': summary})
-        
-        # Delay between API calls if specified
-        if 'delay' in config['summarization']:
-            time.sleep(config['summarization']['delay'])
+
+    # Local models share one GPU, so only API providers are summarized concurrently by default,
+    # while local models summarize several papers per forward pass instead
+    local = provider.lower() == 'hf'
+    workers = summarization.get('workers', 1 if local else 4)
+    batch_size = summarization.get('batch_size', 8) if local else 1
+    # OpenAI's Batch API summarizes many papers per job at half the price, finishing within 24 hours
+    openai_batch = provider.lower() == 'openai' and summarization.get('openai_batch', False)
+    if openai_batch:
+        batch_size = summarization.get('batch_size', 1000)
+    # Summaries waiting to be written to the database in a batch, by paper ID and by cache key
+    pending, pending_cache = {}, {}
+
+    def flush():
+        db.cache_summaries(pending_cache)
+        db.update_papers({paper_id: {'summary': summary} for paper_id, summary in pending.items()})
+        pending.clear()
+        pending_cache.clear()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, tqdm(desc="Summarizing papers") as progress:
+        # Batches being summarized, mapped to the ID, title and cache key of their papers
+        futures = {}
+
+        def collect(done):
+            for future in done:
+                batch = futures.pop(future)
+                progress.update(len(batch))
+                try:
+                    summaries = future.result()
+                except Exception as e:
+                    for _, title, _ in batch:
+                        print(f"Error summarizing {title}: {e}")
+                    continue
+
+                # Queue the papers' summaries and write them to the database in batches
+                for (paper_id, title, key), summary in zip(batch, summaries):
+                    if summary is None:
+                        print(f"Error summarizing {title}: request failed in the batch")
+                        continue
+                    pending[paper_id] = summary
+                    pending_cache[key] = summary
+            if len(pending) >= commit_every:
+                flush()
+
+        def submit(batch):
+            # Summarizing is much slower than reading, so wait for a batch to finish before queueing more than
+            # two per worker, instead of holding the prepared content of the whole collection in memory.
+            # This may wait for hours on an OpenAI batch job, but iter_papers holds no transaction between
+            # its batches, so the database is not kept from checkpointing meanwhile
+            if len(futures) >= 2 * workers:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                collect(done)
+            future = executor.submit(process, [content for _, _, _, content in batch])
+            futures[future] = [(paper_id, title, key) for paper_id, title, key, _ in batch]
+
+        batch = []
+        for paper in papers:
+            # Papers whose PDF could not be parsed have nothing to summarize
+            if not paper.content:
+                continue
+            content = prepare(paper)
+
+            # Reuse the summary of an identical prompt instead of calling the model again,
+            # unless summaries are explicitly regenerated
+            key = make_summary_key(provider, model_name, build_prompt(prefix, content, suffix), key_param)
+            summary = None if enforce_resummary else db.get_cached_summary(key)
+            if summary is not None:
+                pending[paper.id] = summary
+                if len(pending) >= commit_every:
+                    flush()
+                continue
+
+            # Start summarizing each full batch while the remaining papers are read
+            batch.append((paper.id, paper.title, key, content))
+            if len(batch) >= batch_size:
+                submit(batch)
+                batch = []
+        if batch:
+            submit(batch)
+
+        collect(as_completed(list(futures)))
+
+    flush()
 
 
 def main():
@@ -163,12 +416,29 @@ def main():
     if not isinstance(configs, list):
         configs = [configs]
 
-    # Process each configuration
+    # Process each configuration, reusing one database connection per URL
+    databases = {}
+    loaded_model = None
     for config in configs:
+        db_url = config['paths'].get('db_path', get_db_url())
+        if db_url not in databases:
+            databases[db_url] = Database(db_url)
+            databases[db_url].create_tables()
+        db = databases[db_url]
+
         if 'scraping' in config:
-            scrape_papers(config)
+            scrape_papers(config, db)
         if 'summarization' in config:
-            summarize_papers(config)
+            # Local models stay loaded for the following configurations, unless those use another model
+            # or load it with other options, which would keep a second copy in memory
+            summarization = config['summarization']
+            if summarization['provider'].lower() == 'hf':
+                load_key = (summarization['model_name'], summarization.get('quantization'),
+                            summarization.get('model_kwargs') or {})
+                if loaded_model not in (None, load_key):
+                    unload_model()
+                loaded_model = load_key
+            summarize_papers(config, db)
 
     print("\nAll configurations processed.")
 
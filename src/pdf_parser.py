@@ -1,114 +1,432 @@
+import gzip
+import hashlib
 import io
 import os
+import queue
 import re
+import shutil
+import threading
 import warnings
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception_type
 
+import fitz
 import PyPDF2
 import pytesseract
-from pdf2image import convert_from_path
-from pdfminer.converter import TextConverter
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pdfminer.high_level import extract_text
 from pdfminer.layout import LAParams
-from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
-from pdfminer.pdfpage import PDFPage
+
+# tesserocr keeps tesseract loaded in-process, but needs libtesseract headers to install
+try:
+    from tesserocr import PyTessBaseAPI
+except ImportError:
+    PyTessBaseAPI = None
 
 # Filter PyPDF2 warnings about float objects
 warnings.filterwarnings('ignore', category=UserWarning, module='PyPDF2')
 
+# Patterns used by clean_text, compiled once at import
+_WHITESPACE_RE = re.compile(r'\s+')
+_LATEXIT_RE = re.compile(r'<latexit[^>]*>.*?</latexit>', re.DOTALL)
+_HYPHEN_RE = re.compile(r'(\w+)-\s*(\w+)')
+
+# PDFs with fewer extractable characters than this and embedded images are treated as scanned
+_MIN_TEXT_CHARS = 200
+
+# Responses larger than this are not downloaded
+_MAX_PDF_BYTES = 200 << 20
+
+# Shared HTTP session, so downloads from the same host reuse pooled keep-alive connections.
+# The adapter quickly retries dropped connections, e.g. a keep-alive socket the server already closed,
+# while HTTP errors and repeated failures are left to download_pdf's slower tenacity backoff
+_ADAPTER_RETRY = Retry(total=2, status=0, backoff_factor=0.5)
+_SESSION = requests.Session()
+_SESSION.headers['User-Agent'] = f"PaperBriefing/1.0 {requests.utils.default_user_agent()}"
+_SESSION.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=_ADAPTER_RETRY))
+_SESSION.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=_ADAPTER_RETRY))
+
+# Idle tesserocr instances, kept for the whole process so the language model is loaded once per instance
+# rather than once per PDF or thread
+_OCR_APIS = queue.SimpleQueue()
+
+# One OCR pool shared by all PDFs parsed concurrently, so OCR never runs more pages at once than there are CPUs,
+# and its worker threads live for the whole process
+_OCR_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.environ.get('OCR_CONCURRENCY', os.cpu_count() or 1)),
+                                   thread_name_prefix='ocr')
+
+
+# Longest Retry-After delay honored before giving up on the wait, in seconds
+_MAX_RETRY_AFTER = 120
+
+# Jittered exponential backoff, so concurrent downloads hitting the same failing host do not retry in lockstep
+_BACKOFF = wait_exponential_jitter(initial=1, max=30, jitter=2)
+
+
+class RetryableHTTPError(Exception):
+    """Raised for HTTP responses that may succeed when retried (server errors and rate limiting)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value):
+    """Convert a Retry-After header, given in seconds or as an HTTP date, to seconds to wait."""
+    if not value:
+        return None
+    try:
+        if value.strip().isdigit():
+            seconds = int(value)
+        else:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+    except (TypeError, ValueError):
+        return None
+    return min(max(seconds, 0), _MAX_RETRY_AFTER)
+
+
+def _wait_for_retry(retry_state):
+    # Wait as long as the server asked for when rate limited, otherwise back off exponentially
+    retry_after = getattr(retry_state.outcome.exception(), 'retry_after', None)
+    return retry_after if retry_after is not None else _BACKOFF(retry_state)
+
+
+# Transient failures worth retrying; reading response.raw raises urllib3's exceptions rather than requests'
+_RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    urllib3.exceptions.HTTPError,
+    RetryableHTTPError,
+)
+
+
+def is_complete_pdf(path):
+    """
+    Check whether a file looks like a complete PDF, i.e. starts with the PDF header and ends with an EOF marker.
+    
+    :param path: str, path to the file
+    :return: bool, whether the file is a complete PDF
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(5) != b'%PDF-':
+                return False
+            # The EOF marker is within the last bytes, unless the download was cut off
+            f.seek(max(os.path.getsize(path) - 1024, 0))
+            return b'%%EOF' in f.read()
+    except OSError:
+        return False
+
 
 def download_pdf(filename, url, output_dir):
     """
     Download a PDF file and save it to the specified directory.
     
-    :param title: str, title of the paper
+    :param filename: str, name of the file to save the PDF as
     :param url: str, URL of the PDF
     :param output_dir: str, directory to save the PDF
+    :return: str or None, path of the saved PDF, None if the download failed
     """
+    # PDFs do not change once published, so a complete file from an earlier run is reused
+    filepath = os.path.join(output_dir, filename)
+    if is_complete_pdf(filepath):
+        return filepath
+    part_path = filepath + '.part'
+
     @retry(
-        retry=retry_if_exception_type(Exception),
-        wait=wait_exponential(multiplier=1, min=4, max=60),
+        retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+        wait=_wait_for_retry,
         stop=stop_after_attempt(5)
     )
     def _download_with_retry():
-        response = requests.get(url)
-        if response.status_code != 200:
-            raise Exception(f"Failed to download PDF: HTTP {response.status_code}")
-        filepath = os.path.join(output_dir, filename)
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
+        with _SESSION.get(url, stream=True, timeout=(5, 30)) as response:
+            if response.status_code >= 500 or response.status_code == 429:
+                raise RetryableHTTPError(f"Failed to download PDF: HTTP {response.status_code}",
+                                         retry_after=_parse_retry_after(response.headers.get('Retry-After')))
+            if response.status_code != 200:
+                # Client errors such as 404 will not succeed on a retry
+                raise Exception(f"Failed to download PDF: HTTP {response.status_code}")
+            # Dead links often answer with an HTML page, check the headers before reading the body
+            content_type = response.headers.get('Content-Type', '')
+            if 'html' in content_type:
+                raise Exception(f"Failed to download PDF: got {content_type}")
+            if int(response.headers.get('Content-Length', 0)) > _MAX_PDF_BYTES:
+                raise Exception(f"Failed to download PDF: {response.headers['Content-Length']} bytes is too large")
+            # Stream the body to a temporary file instead of holding the whole PDF in memory,
+            # and only move it into place once complete so an interrupted download leaves no partial PDF
+            response.raw.decode_content = True
+            with open(part_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=1 << 16)
+        if not is_complete_pdf(part_path):
+            os.remove(part_path)
+            raise Exception("Failed to download PDF: response is not a PDF file")
+        os.replace(part_path, filepath)
         return filepath
 
     try:
         return _download_with_retry()
     except Exception as e:
-        print(f"Failed to download after retries: {str(e)}")
+        print(f"Failed to download {url}: {str(e)}")
         return None
 
 
-def parse_pdf(pdf_path, use_pypdf2=True):
+def _ocr_image(image):
     """
-    Parse a PDF file into plain text, handling both single-column and double-column layouts.
-    Uses pdfminer by default, falls back to OCR for images, and optionally can use PyPDF2.
+    Run OCR on a page image, reusing an idle tesseract instance when tesserocr is available.
+    
+    :param image: PIL.Image, rendered page
+    :return: str, recognized text
+    """
+    if PyTessBaseAPI is None:
+        return pytesseract.image_to_string(image)
+
+    # Instances are only created while all others are busy, i.e. at most one per concurrent OCR call
+    try:
+        api = _OCR_APIS.get_nowait()
+    except queue.Empty:
+        api = PyTessBaseAPI()
+    try:
+        api.SetImage(image)
+        return api.GetUTF8Text()
+    finally:
+        _OCR_APIS.put(api)
+
+
+def _ocr_page(pdf_path, page_number, dpi):
+    """
+    Render a single PDF page to a grayscale image and run OCR on it.
     
     :param pdf_path: str, path to the PDF file
-    :param use_pypdf2: bool, whether to use PyPDF2 as the first method (default: True)
-    :return: str, extracted text from the PDF
+    :param page_number: int, 1-based page number
+    :param dpi: int, rendering resolution
+    :return: str, recognized text
+    """
+    # Tesseract works on grayscale internally, so render 8-bit pages instead of 24-bit RGB
+    images = convert_from_path(pdf_path, dpi=dpi, grayscale=True, first_page=page_number, last_page=page_number)
+    return _ocr_image(images[0]) if images else ""
+
+
+def _iter_ocr_pages(pdf_path, dpi):
+    """
+    Extract text from a PDF by running OCR on every page, yielding pages in order.
+    
+    :param pdf_path: str, path to the PDF file
+    :param dpi: int, rendering resolution
+    :return: generator of str, recognized text per page
+    """
+    page_count = pdfinfo_from_path(pdf_path)['Pages']
+    # Each worker renders and recognizes one page at a time, so rendering overlaps with OCR
+    # and at most one page image per worker is held in memory
+    pages = _OCR_EXECUTOR.map(lambda page_number: _ocr_page(pdf_path, page_number, dpi), range(1, page_count + 1))
+    try:
+        yield from pages
+    finally:
+        # Closing the results drops this PDF's pages that have not started yet if the caller stops early
+        pages.close()
+
+
+def iter_pdf_pages(pdf_path, use_pypdf2=True, ocr_dpi=150):
+    """
+    Parse a PDF file into plain text page by page, handling both single-column and double-column layouts.
+    Uses PyMuPDF by default, optionally tries PyPDF2, then pdfminer, and falls back to OCR for images.
+    Scanned PDFs detected by PyMuPDF go straight to OCR.
+    
+    :param pdf_path: str, path to the PDF file
+    :param use_pypdf2: bool, whether to try PyPDF2 if PyMuPDF fails (default: True)
+    :param ocr_dpi: int, resolution of page images rendered for OCR; raise for tiny fonts (default: 150)
+    :return: generator of str, extracted text per page
     """
-    if use_pypdf2:
+    # Try PyMuPDF first, its C implementation is much faster than the pure-Python extractors
+    scanned = False
+    try:
+        with fitz.open(pdf_path) as doc:
+            pages = [page.get_text("text") for page in doc]
+            # Scanned PDFs have little or no text layer but embed page images
+            scanned = sum(len(page.strip()) for page in pages) < _MIN_TEXT_CHARS and any(page.get_images() for page in doc)
+        if any(page.strip() for page in pages) and not scanned:
+            yield from pages
+            return
+    except Exception:
+        pass  # Fall through to PyPDF2/pdfminer if PyMuPDF fails
+
+    # The other text extractors cannot do better on scanned PDFs, so skip them
+    if not scanned:
+        if use_pypdf2:
+            try:
+                with open(pdf_path, 'rb') as file:
+                    pdf_reader = PyPDF2.PdfReader(file)
+                    # extract_text() returns None for some encrypted or malformed pages
+                    pages = [page.extract_text() or "" for page in pdf_reader.pages]
+                if any(page.strip() for page in pages):
+                    yield from pages
+                    return
+            except Exception:
+                pass  # Fall through to pdfminer if PyPDF2 fails
+
+        # Try pdfminer next, keeping layout analysis for multi-column papers
         try:
-            text = ""
+            # pdfminer seeks and reads in small pieces, so parse from an in-memory copy of the file
             with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
+                buffer = io.BytesIO(file.read())
+            text = extract_text(buffer, laparams=LAParams())
             if text.strip():
-                return text
+                # pdfminer ends every page with a form feed
+                yield from text.split('\f')
+                return
         except Exception:
-            pass  # Fall through to pdfminer if PyPDF2 fails
-
-    # Try pdfminer first
-    try:
-        text = ""
-        resource_manager = PDFResourceManager()
-        fake_file_handle = io.StringIO()
-        converter = TextConverter(resource_manager, fake_file_handle, laparams=LAParams())
-        page_interpreter = PDFPageInterpreter(resource_manager, converter)
-        
-        with open(pdf_path, 'rb') as fh:
-            for page in PDFPage.get_pages(fh, caching=True, check_extractable=True):
-                page_interpreter.process_page(page)
-            text = fake_file_handle.getvalue()
-        converter.close()
-        fake_file_handle.close()
-        
-        if text.strip():
-            return text
-    except Exception:
-        pass
+            pass
 
     # If pdfminer fails, use OCR as last resort
     try:
-        text = ""
-        images = convert_from_path(pdf_path)
-        for image in images:
-            text += pytesseract.image_to_string(image)
-        return text
+        yield from _iter_ocr_pages(pdf_path, ocr_dpi)
     except Exception as e:
         print(f"All PDF parsing methods failed. Last error: {str(e)}")
-        return ""
 
 
-def clean_text(text):
+def parse_pdf(pdf_path, use_pypdf2=True, ocr_dpi=150):
+    """
+    Parse a PDF file into plain text, see iter_pdf_pages.
+    
+    :param pdf_path: str, path to the PDF file
+    :param use_pypdf2: bool, whether to try PyPDF2 if PyMuPDF fails (default: True)
+    :param ocr_dpi: int, resolution of page images rendered for OCR; raise for tiny fonts (default: 150)
+    :return: str, extracted text from the PDF
+    """
+    return "\n".join(iter_pdf_pages(pdf_path, use_pypdf2=use_pypdf2, ocr_dpi=ocr_dpi))
+
+
+def parse_and_clean_pdf(pdf_path, use_pypdf2=True, ocr_dpi=150, strip_latexit=False, join_hyphens=False, cap_at=None):
+    """
+    Parse a PDF file and clean its text in a single pass, cleaning each page as it is extracted.
+    
+    :param pdf_path: str, path to the PDF file
+    :param use_pypdf2: bool, whether to try PyPDF2 if PyMuPDF fails (default: True)
+    :param ocr_dpi: int, resolution of page images rendered for OCR (default: 150)
+    :param strip_latexit: bool, whether to remove embedded <latexit> blocks (default: False)
+    :param join_hyphens: bool, whether to join words hyphenated across line breaks (default: False)
+    :param cap_at: str, marker at which to cut off the text, e.g. the references heading (default: None)
+    :return: str, cleaned text from the PDF
+    """
+    # The uncleaned text of the whole document is never held in memory at once
+    parts = []
+    # End of the text so far, so a marker split across a page break is found as in the joined text
+    tail = ''
+    for page in iter_pdf_pages(pdf_path, use_pypdf2=use_pypdf2, ocr_dpi=ocr_dpi):
+        page = clean_text(page, strip_latexit=strip_latexit, join_hyphens=join_hyphens)
+        if not page:
+            continue
+        if cap_at:
+            window = f'{tail} {page}' if parts else page
+            position = window.find(cap_at)
+            if position != -1:
+                # Stop before extracting the pages after the marker, which matters most for OCR
+                text = f'{" ".join(parts)} {page}' if parts else page
+                return text[:len(text) - len(window) + position]
+            tail = window[-(len(cap_at) - 1):] if len(cap_at) > 1 else ''
+        parts.append(page)
+    return " ".join(parts)
+
+
+def file_digest(path, chunk_size=1 << 16):
+    """
+    Compute a BLAKE2b hex digest of a file's content, reading it in chunks.
+    
+    :param path: str, path to the file
+    :param chunk_size: int, number of bytes read per chunk
+    :return: str, hex digest of the file content
+    """
+    with open(path, 'rb') as f:
+        # hashlib.file_digest (Python 3.11+) hashes straight from the file without Python-level reads
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+
+def parse_pdf_cached(pdf_path, cache_dir, use_pypdf2=True, ocr_dpi=150, strip_latexit=False, join_hyphens=False,
+                     cap_at=None):
+    """
+    Parse and clean a PDF file like parse_and_clean_pdf, caching the cleaned text on disk keyed by the PDF's
+    content hash and the cleaning options. Cached text is stored gzip-compressed.
+    
+    :param pdf_path: str, path to the PDF file
+    :param cache_dir: str, directory holding the cached text files
+    :param use_pypdf2: bool, whether to try PyPDF2 if PyMuPDF fails (default: True)
+    :param ocr_dpi: int, resolution of page images rendered for OCR (default: 150)
+    :param strip_latexit: bool, whether to remove embedded <latexit> blocks (default: False)
+    :param join_hyphens: bool, whether to join words hyphenated across line breaks (default: False)
+    :param cap_at: str, marker at which to cut off the text (default: None)
+    :return: str, cleaned text from the PDF
+    """
+    parser = 'fitz-pypdf2' if use_pypdf2 else 'fitz-pdfminer'
+    options = ''.join(flag for flag, enabled in (('-latexit', strip_latexit), ('-hyphens', join_hyphens)) if enabled)
+    # Whether a PDF needs OCR is only known after parsing it, so the resolution is always part of the key
+    options += f'-dpi{ocr_dpi}'
+    if cap_at:
+        options += f"-cap{hashlib.blake2b(cap_at.encode('utf-8'), digest_size=4).hexdigest()}"
+    cache_path = os.path.join(cache_dir, f'{file_digest(pdf_path)}_{parser}_clean{options}.txt.gz')
+    if os.path.exists(cache_path):
+        try:
+            with gzip.open(cache_path, 'rt', encoding='utf-8') as f:
+                text = f.read()
+        except (OSError, EOFError):
+            text = None
+        # Empty text is never cached, so like an unreadable file it is a truncated entry
+        # from an interrupted write, which is dropped and parsed again
+        if text:
+            return text
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+
+    text = parse_and_clean_pdf(pdf_path, use_pypdf2=use_pypdf2, ocr_dpi=ocr_dpi,
+                               strip_latexit=strip_latexit, join_hyphens=join_hyphens, cap_at=cap_at)
+    # Do not cache failed parses so they are retried on the next run
+    if text:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a file of this thread and move it into place once complete, so an interrupted write
+        # or another worker parsing the same PDF never leaves a truncated entry
+        part_path = f'{cache_path}.{os.getpid()}-{threading.get_ident()}.part'
+        try:
+            with gzip.open(part_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                f.write(text)
+            os.replace(part_path, cache_path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+    return text
+
+
+def clean_text(text, strip_latexit=False, join_hyphens=False):
     """
     Clean the extracted text by removing extra whitespace and removing non-UTF-8 characters.
     
     :param text: str, input text to clean
+    :param strip_latexit: bool, whether to remove embedded <latexit> blocks (default: False)
+    :param join_hyphens: bool, whether to join words hyphenated across line breaks (default: False)
     :return: str, cleaned text
     """
+    if strip_latexit:
+        text = _LATEXIT_RE.sub('', text)
     # Remove extra whitespace
-    text = ' '.join(text.split())
-    # Remove non-UTF-8 characters
-    text = ''.join(char for char in text if ord(char) < 128)
+    text = _WHITESPACE_RE.sub(' ', text).strip()
+    if join_hyphens:
+        # Also joins genuine hyphenated compounds, hence opt-in
+        text = _HYPHEN_RE.sub(r'\1\2', text)
+    # Remove non-ASCII characters in a single C-level pass; isascii() is a flag check on CPython,
+    # so pages that are already ASCII are not copied at all
+    if not text.isascii():
+        text = text.encode('ascii', 'ignore').decode('ascii')
         
     return text
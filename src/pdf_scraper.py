@@ -1,11 +1,21 @@
+import atexit
+import functools
+import hashlib
+import json
 import os
+import queue
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 
 from tqdm import tqdm
+import lxml.html
 import requests
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.firefox.service import Service as FirefoxService
@@ -16,9 +26,19 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 from urllib.parse import urljoin
 
 
+@functools.lru_cache(maxsize=1)
+def get_geckodriver_path():
+    """
+    Install geckodriver if needed and return its path, resolving it only once per process.
+    """
+    return GeckoDriverManager().install()
+
+
+@functools.lru_cache(maxsize=1)
 def check_firefox_installation():
     """
     Check Firefox ESR installation and print debug information.
+    The result is cached, since every driver setup checks the installation.
     """
     try:
         # Check Firefox ESR version
@@ -26,7 +46,7 @@ def check_firefox_installation():
         print(f"Firefox ESR version: {firefox_version}")
         
         # Check geckodriver
-        driver_path = GeckoDriverManager().install()
+        driver_path = get_geckodriver_path()
         print(f"Geckodriver path: {driver_path}")
         
         return True
@@ -61,6 +81,15 @@ def setup_firefox_driver():
     
     # Reduce memory usage
     options.set_preference('browser.sessionhistory.max_entries', 10)
+
+    # Only the DOM is scraped, so skip images, web fonts, media and notifications
+    options.set_preference('permissions.default.image', 2)
+    options.set_preference('gfx.downloadable_fonts.enabled', False)
+    options.set_preference('browser.display.use_document_fonts', 0)
+    options.set_preference('media.autoplay.default', 5)
+    options.set_preference('dom.webnotifications.enabled', False)
+    # Return from driver.get at DOMContentLoaded, elements are waited for explicitly anyway
+    options.page_load_strategy = 'eager'
     
     # Set the binary location to Firefox ESR
     options.binary_location = '/usr/bin/firefox-esr'
@@ -68,7 +97,7 @@ def setup_firefox_driver():
     try:
         print("Setting up Firefox ESR driver...")
         service = FirefoxService(
-            GeckoDriverManager().install(),
+            get_geckodriver_path(),
             log_output=os.path.devnull  # Suppress Geckodriver logs
         )
         
@@ -90,6 +119,8 @@ def setup_chrome_driver():
     chrome_options.add_argument('--headless')
     chrome_options.add_argument('--no-sandbox')
     chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    chrome_options.page_load_strategy = 'eager'
     return webdriver.Chrome(options=chrome_options)
 
 
@@ -102,134 +133,496 @@ def setup_driver(browser_name):
         raise ValueError(f"Unsupported browser: {browser_name}")
 
 
-def scrape_openreview(conference, year, track, submission_type=None, num_cap=None, browser_name="firefox"):
+# Seconds between polls of WebDriverWait, the default of 0.5 adds up to half a second to every wait
+_POLL_FREQUENCY = 0.1
+
+# Scraped paper info is reused for this many seconds, conference pages rarely change after publication
+_INFO_CACHE_TTL = 30 * 24 * 3600
+
+# Shared HTTP session for static pages fetched without a browser, reusing keep-alive connections across papers
+_SESSION = requests.Session()
+
+# Locators shared by several waits and lookups
+_NOTE = (By.CLASS_NAME, "note")
+_NEXT_PAGE_BUTTON = (By.XPATH, "//li[contains(@class, 'right-arrow')]/a/span[text()='›']")
+_PAPER_TITLE = (By.CSS_SELECTOR, "h2.card-title.main-title.text-center")
+_PAPER_PDF_LINK = (By.XPATH, "//a[contains(text(), 'Paper PDF')]")
+_POSTER_LINK = (By.CSS_SELECTOR, "a[href*='poster/']")
+
+# Read every OpenReview note's title and PDF link in one WebDriver call instead of several per note
+_NOTES_SCRIPT = """
+return Array.from(document.querySelectorAll('.note')).map(note => {
+    const title = note.querySelector('h4');
+    const pdfLink = note.querySelector("a[title='Download PDF']");
+    return [title ? title.innerText.trim() : '', pdfLink ? pdfLink.href : ''];
+});
+"""
+_FIRST_NOTE_TITLE_SCRIPT = """
+const title = document.querySelector('.note h4');
+return title ? title.innerText.trim() : '';
+"""
+
+
+def _is_driver_alive(driver):
+    """
+    Check whether a driver's browser session still responds.
+    """
+    try:
+        driver.current_url
+        return True
+    except WebDriverException:
+        return False
+
+
+def _quit_driver(driver):
+    """
+    Quit a driver if there is one, reporting instead of raising errors.
+    """
+    if driver:
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error closing driver: {str(e)}")
+
+
+class BrowserPool:
+    """
+    Keep started browsers alive across scrapes and lend each one to a single user at a time,
+    so browser start-up is paid once per process rather than once per scrape.
+    """
+
+    def __init__(self, browser_name):
+        self.browser_name = browser_name
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.drivers = []
+
+    def acquire(self):
+        """
+        Take an idle browser, replacing crashed ones, or start a new one if none is idle.
+        """
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if _is_driver_alive(driver):
+                return driver
+            self.discard(driver)
+
+        driver = setup_driver(self.browser_name)
+        with self.lock:
+            self.drivers.append(driver)
+        return driver
+
+    def release(self, driver):
+        """
+        Return a browser to the pool for the next user.
+        """
+        self.idle.put(driver)
+
+    def discard(self, driver):
+        """
+        Quit a browser and remove it from the pool, e.g. after its session died.
+        """
+        with self.lock:
+            if driver in self.drivers:
+                self.drivers.remove(driver)
+        _quit_driver(driver)
+
+    def close(self):
+        """
+        Quit all browsers of the pool.
+        """
+        with self.lock:
+            drivers, self.drivers = self.drivers, []
+        for driver in drivers:
+            _quit_driver(driver)
+        self.idle = queue.Queue()
+
+
+_BROWSER_POOLS = {}
+
+
+def get_browser_pool(browser_name):
+    """
+    Get the process-wide browser pool for a browser, creating it on first use.
+    """
+    if browser_name not in _BROWSER_POOLS:
+        _BROWSER_POOLS[browser_name] = BrowserPool(browser_name)
+    return _BROWSER_POOLS[browser_name]
+
+
+@atexit.register
+def close_browser_pools():
+    """
+    Quit all pooled browsers, called automatically when the process exits.
+    """
+    for pool in _BROWSER_POOLS.values():
+        pool.close()
+
+
+def _info_cache_path(cache_dir, paper_url):
+    """
+    Get the cache file of a paper page, named after the hash of its URL.
+    """
+    return os.path.join(cache_dir, f"{hashlib.sha1(paper_url.encode('utf-8')).hexdigest()}.json")
+
+
+def _load_cached_info(cache_dir, paper_url):
+    """
+    Load the cached info of a paper page.
+    
+    :param cache_dir: str, cache directory, None to disable caching
+    :param paper_url: str, URL of the paper page
+    :return: tuple (title, pdf_url), None if not cached or expired
+    """
+    if not cache_dir:
+        return None
+    path = _info_cache_path(cache_dir, paper_url)
+    try:
+        if time.time() - os.path.getmtime(path) > _INFO_CACHE_TTL:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return tuple(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+
+def _store_cached_info(cache_dir, paper_url, paper_info):
+    """
+    Cache the info of a paper page.
+    
+    :param cache_dir: str, cache directory, None to disable caching
+    :param paper_url: str, URL of the paper page
+    :param paper_info: tuple (title, pdf_url)
+    """
+    if not cache_dir:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(_info_cache_path(cache_dir, paper_url), 'w', encoding='utf-8') as f:
+        json.dump(list(paper_info), f)
+
+
+@functools.lru_cache(maxsize=None)
+def check_url_exists(url):
+    """
+    Fail fast on a listing page that does not exist (e.g. a wrong conference or year)
+    before spending seconds on starting a browser.
+    
+    :param url: str, URL of the page
+    :raises ValueError: if the server reports that the page does not exist
+    """
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=5)
+    except requests.exceptions.RequestException as e:
+        print(f"Could not check {url}: {str(e)}")
+        return
+    # Only trust definite answers, some servers reject HEAD requests or bots with other errors
+    if response.status_code in (404, 410):
+        raise ValueError(f"Page not found (HTTP {response.status_code}): {url}")
+
+
+def find_links(driver, href_part):
+    """
+    Collect the absolute URLs of all links on the current page whose href contains a given string.
+    The page source is parsed once with lxml instead of querying every link through the WebDriver.
+    
+    :param driver: WebDriver, browser showing the page
+    :param href_part: str, substring the href must contain
+    :return: list of str, unique link URLs in document order
+    """
+    tree = lxml.html.fromstring(driver.page_source)
+    tree.make_links_absolute(driver.current_url)
+    # Listings often link the same paper several times, e.g. from its title and its thumbnail
+    hrefs = tree.xpath("//a[contains(@href, $part)]/@href", part=href_part)
+    return list(dict.fromkeys(href for href in hrefs if href))
+
+
+def find_static_link(url, xpath):
+    """
+    Fetch a static HTML page without a browser and return the first link matching an XPath expression.
+    
+    :param url: str, URL of the page
+    :param xpath: str, XPath expression selecting href attributes
+    :return: str or None, absolute URL of the link, None if the page could not be fetched or has no such link
+    """
+    try:
+        response = _SESSION.get(url, timeout=15)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Could not fetch {url} without a browser: {str(e)}")
+        return None
+    tree = lxml.html.fromstring(response.content)
+    tree.make_links_absolute(response.url)
+    hrefs = tree.xpath(xpath)
+    return hrefs[0] if hrefs else None
+
+
+def _iter_paper_info(paper_links, get_paper_info, drivers, cache_dir=None):
+    """
+    Visit paper pages concurrently, lending each driver to one worker at a time.
+    Pages whose info is cached in `cache_dir` are not visited.
+    
+    :param paper_links: list of str, URLs of the paper pages
+    :param get_paper_info: callable, called with (driver, paper_url), returns (title, pdf_url) or None to skip
+    :param drivers: list of WebDriver, browsers to visit the pages with
+    :param cache_dir: str, directory caching the info of each paper page (optional)
+    :return: generator of tuples (paper_url, paper_info, error) in the order of paper_links; close it when
+        stopping early, so unvisited pages are dropped and running visits finish before the drivers are reused
+    """
+    idle_drivers = queue.Queue()
+    for driver in drivers:
+        idle_drivers.put(driver)
+
+    def _scrape_paper(paper_url):
+        paper_info = _load_cached_info(cache_dir, paper_url)
+        if paper_info is not None:
+            return paper_info
+        driver = idle_drivers.get()
+        try:
+            paper_info = get_paper_info(driver, paper_url)
+        finally:
+            idle_drivers.put(driver)
+        if paper_info is not None:
+            _store_cached_info(cache_dir, paper_url, paper_info)
+        return paper_info
+
+    executor = ThreadPoolExecutor(max_workers=len(drivers))
+    try:
+        # Results are yielded in page order, so stopping after max_papers keeps the same papers on every run
+        futures = [(paper_url, executor.submit(_scrape_paper, paper_url)) for paper_url in paper_links]
+        for paper_url, future in futures:
+            try:
+                yield paper_url, future.result(), None
+            except Exception as e:
+                yield paper_url, None, e
+    finally:
+        # Drop the pages that have not been visited yet if the caller stops early
+        executor.shutdown(cancel_futures=True)
+
+
+def wait_for_stable_count(driver, by, value, timeout=15, stable_for=0.7, poll_frequency=0.2):
+    """
+    Wait until the number of elements matching a locator stops changing, e.g. after lazy loading.
+    
+    :param driver: WebDriver, browser to poll
+    :param by: str, locator strategy (e.g., By.CLASS_NAME)
+    :param value: str, locator value
+    :param timeout: float, maximum number of seconds to wait
+    :param stable_for: float, number of seconds the count must stay unchanged
+    :param poll_frequency: float, number of seconds between polls
+    :return: int, number of matching elements
+    """
+    state = {'count': -1, 'since': 0.0}
+
+    def _is_stable(driver):
+        count = len(driver.find_elements(by, value))
+        now = time.monotonic()
+        if count != state['count']:
+            state['count'], state['since'] = count, now
+            return False
+        return now - state['since'] >= stable_for
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(_is_stable)
+    except TimeoutException:
+        pass  # Still loading, continue with what is there
+    return state['count']
+
+
+def _scrape_openreview_api(conference, year, track, submission_type=None, num_cap=None, on_paper=None):
     """
-    Scrape OpenReview for PDFs based on given parameters using Selenium with Firefox.
+    List OpenReview papers through the JSON API that backs the OpenReview website.
+    
+    :param conference: str, conference name (e.g., 'ICLR.cc', 'NeurIPS.cc')
+    :param year: int, year of the conference
+    :param track: str, track name (e.g., 'Conference')
+    :param submission_type: str, tab of the group page, 'tab-accept-<decision>' (e.g., 'tab-accept-oral')
+    :param num_cap: int, maximum number of papers to scrape
+    :param on_paper: callable, called with (paper_id, title, pdf_url) as soon as each paper is found
+    :return: list of tuples (paper_id, paper_title, pdf_url)
+    """
+    venue_id = f"{conference}/{year}/{track}"
+    # Accepted papers carry the decision in their venue string, e.g. 'ICLR 2024 oral'
+    decision = submission_type[len('tab-accept-'):].replace('-', ' ') if submission_type else None
+
+    papers = []
+    offset = 0
+    while True:
+        response = requests.get(
+            "https://api2.openreview.net/notes",
+            params={'content.venueid': venue_id, 'limit': 1000, 'offset': offset},
+            timeout=30
+        )
+        response.raise_for_status()
+        notes = response.json().get('notes', [])
+
+        for note in notes:
+            content = note.get('content', {})
+            title = content.get('title', {}).get('value', '').strip()
+            pdf_path = content.get('pdf', {}).get('value')
+            venue = content.get('venue', {}).get('value', '').lower()
+            if not title or not pdf_path or (decision and decision not in venue):
+                continue
+
+            # Same ID format as the Selenium scraper, so both paths map to the same stored papers
+            paper_id = f'{title}_{conference}_{year}_{track}_{submission_type}'
+            papers.append((paper_id, title, urljoin("https://openreview.net", pdf_path)))
+            if on_paper:
+                on_paper(*papers[-1])
+            if num_cap is not None and len(papers) >= num_cap:
+                return papers
+
+        if len(notes) < 1000:
+            return papers
+        offset += len(notes)
+
+
+def scrape_openreview(conference, year, track, submission_type=None, num_cap=None, browser_name="firefox",
+                      use_api=True, on_paper=None):
+    """
+    Scrape OpenReview for PDFs based on given parameters, using the OpenReview API if possible
+    and Selenium with Firefox otherwise.
     
     :param conference: str, conference name (e.g., 'ICLR', 'NeurIPS')
     :param year: int, year of the conference
     :param track: str, track name (e.g., 'Poster', 'Oral')
     :param submission_type: str, type of submission
     :param num_cap: int, maximum number of papers to scrape
+    :param use_api: bool, whether to try the OpenReview API before falling back to Selenium (default: True)
+    :param on_paper: callable, called with (paper_id, title, pdf_url) as soon as each paper is found
     :return: list of tuples (paper_title, pdf_url)
     """
+    # The API can only filter accepted papers by decision, other tabs need the browser
+    if use_api and (submission_type is None or submission_type.startswith('tab-accept-')):
+        try:
+            papers = _scrape_openreview_api(conference, year, track, submission_type, num_cap, on_paper)
+            if papers:
+                print(f"Found {len(papers)} papers through the OpenReview API")
+                return papers
+            print("No papers found through the OpenReview API, falling back to Selenium.")
+        except Exception as e:
+            print(f"OpenReview API failed, falling back to Selenium: {str(e)}")
+
     base_url = f"https://openreview.net/group?id={conference}/{year}/{track}"
     if submission_type is not None:
         base_url += f"#{submission_type}"
     
+    pool = get_browser_pool(browser_name)
     driver = None
-    retry_count = 0
+
+    # Only browser and connection errors are worth another attempt, anything else fails right away
+    @retry(
+        retry=retry_if_exception_type((WebDriverException, ConnectionError)),
+        wait=wait_exponential(multiplier=1, min=2, max=30),
+        stop=stop_after_attempt(5),
+        before_sleep=lambda retry_state: print(
+            f"Error during scraping (attempt {retry_state.attempt_number}): {retry_state.outcome.exception()}\n"
+            f"Retrying..."
+        ),
+        reraise=True
+    )
+    def _scrape_pages():
+        nonlocal driver
+        # Keep the browser from a failed attempt unless its session died, starting one is slow
+        if driver is None or not _is_driver_alive(driver):
+            if driver is not None:
+                pool.discard(driver)
+                # Forget the dead browser, so it is not released back to the pool if no new one can be started
+                driver = None
+            driver = pool.acquire()
     
-    while retry_count < 5:
-        try:
-            print(f"\nAttempt {retry_count + 1} of 5")
-            print(f"Initializing Firefox driver...")
-            driver = setup_driver(browser_name)
-            
-            print(f"Navigating to URL: {base_url}")
-            driver.get(base_url)
-            
-            papers = []
-            page_number = 1
-            
-            while True:
-                print(f"Processing page {page_number}", flush=True)
-                # Wait for the content to load with increased timeout
-                print("Waiting for content to load...")
-                WebDriverWait(driver, 20).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, "note"))
-                )
-            
-                # Scroll to load all papers on the current page
-                print("Scrolling through page...")
-                last_height = driver.execute_script("return document.body.scrollHeight")
-                scroll_attempts = 0
-                max_scroll_attempts = 10
-            
-                while scroll_attempts < max_scroll_attempts:
-                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(3)  # Increased wait time
-                    new_height = driver.execute_script("return document.body.scrollHeight")
-                    if new_height == last_height:
-                        break
-                    last_height = new_height
-                    scroll_attempts += 1
-            
-                # Extract paper information
-                print("Extracting paper information...")
-                notes = driver.find_elements(By.CLASS_NAME, "note")
-            
-                for paper in notes:
-                    try:
-                        title = paper.find_element(By.TAG_NAME, "h4").text.strip()
-                        pdf_links = paper.find_elements(By.XPATH, ".//a[@title='Download PDF']")
-                        if pdf_links and len(title.strip()) > 0:
-                            pdf_url = pdf_links[0].get_attribute("href")
-                            paper_id = f'{title}_{conference}_{year}_{track}_{submission_type}'
-                            papers.append((paper_id, title, pdf_url))
-                            print(f"Found paper: {title}")
-                            
-                            # Check if we've reached the num_cap
-                            if num_cap is not None and len(papers) >= num_cap:
-                                print(f"Reached paper cap of {num_cap}")
-                                return papers
-                                
-                    except Exception as e:
-                        print(f"Error extracting paper info: {str(e)}")
-                        continue
-
-                # Store current page papers for comparison
-                current_page_titles = [note.find_element(By.TAG_NAME, "h4").text.strip() 
-                                       for note in notes]
+        print(f"Navigating to URL: {base_url}")
+        driver.get(base_url)
+    
+        papers = []
+        page_number = 1
+    
+        while True:
+            print(f"Processing page {page_number}", flush=True)
+            # Wait for the content to load with increased timeout
+            print("Waiting for content to load...")
+            WebDriverWait(driver, 20, poll_frequency=_POLL_FREQUENCY).until(
+                EC.presence_of_element_located(_NOTE)
+            )
+    
+            # Scroll to load all papers on the current page
+            print("Scrolling through page...")
+            last_count = len(driver.find_elements(*_NOTE))
+            scroll_attempts = 0
+            max_scroll_attempts = 10
+    
+            while scroll_attempts < max_scroll_attempts:
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                # Wait only as long as new notes keep appearing instead of a fixed sleep
+                new_count = wait_for_stable_count(driver, *_NOTE)
+                if new_count == last_count:
+                    break
+                last_count = new_count
+                scroll_attempts += 1
+    
+            # Extract paper information
+            print("Extracting paper information...")
+            notes = driver.execute_script(_NOTES_SCRIPT)
+    
+            for title, pdf_url in notes:
+                if pdf_url and title:
+                    paper_id = f'{title}_{conference}_{year}_{track}_{submission_type}'
+                    papers.append((paper_id, title, pdf_url))
+                    print(f"Found paper: {title}")
+                    if on_paper:
+                        on_paper(paper_id, title, pdf_url)
                 
-                # Check if there's a next page
+                    # Check if we've reached the num_cap
+                    if num_cap is not None and len(papers) >= num_cap:
+                        print(f"Reached paper cap of {num_cap}")
+                        return papers
+
+            # Store the current page's first paper for comparison
+            first_title = notes[0][0] if notes else ''
+        
+            # Check if there's a next page
+            try:
+                next_button = driver.find_element(*_NEXT_PAGE_BUTTON)
+                print("Moving to the next page...", flush=True)
+                # Scroll the button into view using JavaScript
+                driver.execute_script("arguments[0].scrollIntoView(true);", next_button)
+                # Wait for the scroll to complete
+                WebDriverWait(driver, 5, poll_frequency=_POLL_FREQUENCY).until(EC.element_to_be_clickable(next_button))
+                driver.execute_script("arguments[0].click();", next_button)
+
+                # Wait until the next page replaces the first paper, if it never does we are on the last page
                 try:
-                    next_button = driver.find_element(By.XPATH, "//li[contains(@class, 'right-arrow')]/a/span[text()='›']")
-                    print("Moving to the next page...", flush=True)
-                    # Scroll the button into view using JavaScript
-                    driver.execute_script("arguments[0].scrollIntoView(true);", next_button)
-                    # Wait a moment for the scroll to complete
-                    time.sleep(1)
-                    driver.execute_script("arguments[0].click();", next_button)
-                    time.sleep(3)  # Wait for the next page to load
-
-                    # Check if we're still on the same page by comparing paper titles
-                    new_notes = driver.find_elements(By.CLASS_NAME, "note")
-                    new_page_titles = [note.find_element(By.TAG_NAME, "h4").text.strip() 
-                                     for note in new_notes]
-                    
-                    if current_page_titles == new_page_titles:
-                        print("Reached the last page (detected by content comparison)", flush=True)
-                        break
-                    
-                    page_number += 1
-                except Exception as e:
-                    print(f"Navigation error: {e}", flush=True)
-                    print("No more pages or error finding next button.", flush=True)
+                    WebDriverWait(driver, 10, poll_frequency=_POLL_FREQUENCY).until(
+                        lambda d: d.execute_script(_FIRST_NOTE_TITLE_SCRIPT) not in ('', first_title)
+                    )
+                except TimeoutException:
+                    print("Reached the last page (detected by content comparison)", flush=True)
                     break
             
-            return papers
-            
-        except Exception as e:
-            print(f"Error during scraping (attempt {retry_count + 1}): {str(e)}")
-            retry_count += 1
-            if retry_count < 5:
-                print("Retrying...")
-                time.sleep(5)  # Wait before retrying
-            else:
-                print("Max retries reached. Giving up.")
-                raise
-        finally:
-            if driver:
-                try:
-                    driver.quit()
-                except Exception as e:
-                    print(f"Error closing driver: {str(e)}")
+                page_number += 1
+            except Exception as e:
+                print(f"Navigation error: {e}", flush=True)
+                print("No more pages or error finding next button.", flush=True)
+                break
+    
+        return papers
+
+    try:
+        return _scrape_pages()
+    finally:
+        if driver is not None:
+            pool.release(driver)
 
 
-def scrape_ai_conference(conference, year, filter_name=None, filter_value=None, max_papers=None, browser_name="firefox"):
+def scrape_ai_conference(conference, year, filter_name=None, filter_value=None, max_papers=None, browser_name="firefox",
+                         num_drivers=3, cache_dir=None, on_paper=None):
     """
     Scrape papers from the three top AI conference websites (ICLR, ICML, NeurIPS).
+    Paper pages are visited concurrently by a pool of `num_drivers` browser instances,
+    and their info is cached in `cache_dir` if given.
+    `on_paper` is called with (paper_id, title, pdf_url) as soon as each paper is found.
     """
     @retry(
         retry=retry_if_exception_type((Exception)),
@@ -241,8 +634,8 @@ def scrape_ai_conference(conference, year, filter_name=None, filter_value=None,
         Helper function to get paper information with retry mechanism.
         """
         driver.get(paper_url)
-        title_element = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "h2.card-title.main-title.text-center"))
+        title_element = WebDriverWait(driver, 10, poll_frequency=_POLL_FREQUENCY).until(
+            EC.presence_of_element_located(_PAPER_TITLE)
         )
         title = title_element.text.strip() if title_element else "Unknown Title"
 
@@ -250,28 +643,28 @@ def scrape_ai_conference(conference, year, filter_name=None, filter_value=None,
         if conference == 'ICML':
             try:
                 # First try the direct PDF link
-                pdf_element = WebDriverWait(driver, 5).until(
+                pdf_element = WebDriverWait(driver, 5, poll_frequency=_POLL_FREQUENCY).until(
                     EC.presence_of_element_located((By.CSS_SELECTOR, "a[title='PDF']"))
                 )
                 pdf_url = pdf_element.get_attribute('href')
             except Exception:
                 # If direct PDF link not found, try the proceedings link
-                proceedings_element = WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.XPATH, "//a[contains(text(), 'Paper PDF')]"))
+                proceedings_element = WebDriverWait(driver, 5, poll_frequency=_POLL_FREQUENCY).until(
+                    EC.presence_of_element_located(_PAPER_PDF_LINK)
                 )
                 proceedings_url = proceedings_element.get_attribute('href')
 
-                # Navigate to the proceedings page
-                driver.get(proceedings_url)
-
-                # Look for the download PDF link
-                pdf_element = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//a[contains(text(), 'Download PDF')]"))
-                )
-                pdf_url = pdf_element.get_attribute('href')
+                # The proceedings page is static HTML, so only load it in the browser if fetching it directly fails
+                pdf_url = find_static_link(proceedings_url, "//a[contains(text(), 'Download PDF')]/@href")
+                if not pdf_url:
+                    driver.get(proceedings_url)
+                    pdf_element = WebDriverWait(driver, 10, poll_frequency=_POLL_FREQUENCY).until(
+                        EC.presence_of_element_located((By.XPATH, "//a[contains(text(), 'Download PDF')]"))
+                    )
+                    pdf_url = pdf_element.get_attribute('href')
         else:
             # For ICLR and NeurIPS, get PDF through OpenReview
-            openreview_element = WebDriverWait(driver, 10).until(
+            openreview_element = WebDriverWait(driver, 10, poll_frequency=_POLL_FREQUENCY).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "a[title='OpenReview']"))
             )
             openreview_url = openreview_element.get_attribute('href')
@@ -279,7 +672,7 @@ def scrape_ai_conference(conference, year, filter_name=None, filter_value=None,
                 raise Exception("OpenReview URL not found")
 
             driver.get(openreview_url)
-            pdf_element = WebDriverWait(driver, 10).until(
+            pdf_element = WebDriverWait(driver, 10, poll_frequency=_POLL_FREQUENCY).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "a.citation_pdf_url"))
             )
             pdf_url = pdf_element.get_attribute('href')
@@ -288,9 +681,9 @@ def scrape_ai_conference(conference, year, filter_name=None, filter_value=None,
 
         return title, pdf_url
 
-    driver = None
+    pool = get_browser_pool(browser_name)
+    drivers = []
     papers = []
-    paper_count = 0
     
     try:
         # Construct the base URL based on conference
@@ -302,37 +695,44 @@ def scrape_ai_conference(conference, year, filter_name=None, filter_value=None,
         if filter_name and filter_value:
             encoded_filter_value = filter_value.replace(' ', '+')
             base_url += f"?filter={filter_name}&search={encoded_filter_value}"
+        check_url_exists(base_url)
         
-        driver = setup_driver(browser_name)
+        driver = pool.acquire()
+        drivers.append(driver)
         print(f"Fetching papers from {conference}: {base_url}")
         driver.get(base_url)
         # Wait for paper links to be present and visible
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a[href*='poster/']"))
+        WebDriverWait(driver, 20, poll_frequency=_POLL_FREQUENCY).until(
+            EC.presence_of_all_elements_located(_POSTER_LINK)
         )
         
         # Get all paper links from the filtered page
-        paper_elements = driver.find_elements(By.CSS_SELECTOR, "a[href*='poster/']")
-        paper_links = [elem.get_attribute('href') for elem in paper_elements if elem.get_attribute('href')]
-        
-        for paper_url in tqdm(paper_links, desc="Fetching paper URLs"):
-            try:
-                # Use the retry-enabled helper function
-                title, pdf_url = _get_paper_info(driver, paper_url, conference)
-                
+        paper_links = find_links(driver, 'poster/')
+
+        # Each paper costs several sequential page loads, so visit them with a pool of drivers
+        for _ in range(min(num_drivers, len(paper_links)) - 1):
+            drivers.append(pool.acquire())
+
+        # Closing the generator stops the page visits before the drivers are released, also on early exits
+        with closing(_iter_paper_info(
+            paper_links, lambda pool_driver, paper_url: _get_paper_info(pool_driver, paper_url, conference),
+            drivers, cache_dir
+        )) as paper_infos:
+            for paper_url, paper_info, error in tqdm(paper_infos, total=len(paper_links), desc="Fetching paper URLs"):
+                if error is not None:
+                    print(f"Error processing paper {paper_url}: {str(error)}")
+                    continue
+                title, pdf_url = paper_info
+
                 # Generate paper ID and store paper info
                 paper_number = paper_url.split('/')[-1]
                 paper_id = f"{conference}{year}_{paper_number}"
-                
                 papers.append((paper_id, title, pdf_url))
-                paper_count += 1
-                
-                if max_papers and paper_count >= max_papers:
-                    return papers
-                    
-            except Exception as e:
-                print(f"Error processing paper {paper_url}: {str(e)}")
-                continue
+                if on_paper:
+                    on_paper(paper_id, title, pdf_url)
+
+                if max_papers and len(papers) >= max_papers:
+                    break
                 
         return papers
         
@@ -341,14 +741,12 @@ def scrape_ai_conference(conference, year, filter_name=None, filter_value=None,
         raise
         
     finally:
-        if driver:
-            try:
-                driver.quit()
-            except Exception as e:
-                print(f"Error closing driver: {str(e)}")
+        for driver in drivers:
+            pool.release(driver)
 
 
-def scrape_cvpr(year, filter_name=None, filter_value=None, max_papers=None, browser_name="firefox"):
+def scrape_cvpr(year, filter_name=None, filter_value=None, max_papers=None, browser_name="firefox", cache_dir=None,
+                on_paper=None, num_drivers=3):
     """
     Scrape papers from the CVPR conference website.
 
@@ -356,9 +754,52 @@ def scrape_cvpr(year, filter_name=None, filter_value=None, max_papers=None, brow
     :param filter_name: Filter category (e.g., 'sessions')
     :param filter_value: Value to filter by (e.g., 'Oral')
     :param max_papers: Maximum number of papers to scrape (optional)
+    :param cache_dir: Directory caching the scraped info of each paper page (optional)
+    :param on_paper: Callback called with (paper_id, title, pdf_url) as soon as each paper is found (optional)
+    :param num_drivers: Number of browser instances visiting paper pages concurrently (default: 3)
     :return: list of tuples (paper_id, title, pdf_url)
     """
-    driver = None
+    def _get_paper_info(driver, paper_url):
+        """
+        Helper function to get the paper title and PDF link, None if the paper has no PDF page.
+        """
+        # Get paper title and PDF link
+        driver.get(paper_url)
+        title_element = WebDriverWait(driver, 10, poll_frequency=_POLL_FREQUENCY).until(
+            EC.presence_of_element_located(_PAPER_TITLE)
+        )
+        title = title_element.text.strip() if title_element else "Unknown Title"
+        
+        try:
+            # Try finding by link text
+            pdf_page_element = WebDriverWait(driver, 5, poll_frequency=_POLL_FREQUENCY).until(
+                EC.presence_of_element_located(_PAPER_PDF_LINK)
+            )
+        except Exception as e:
+            print(f"Could not find PDF page link: {str(e)}")
+            return None
+
+        # The paper's HTML page on openaccess.thecvf.com is static, so only load it in the browser
+        # if fetching it directly fails
+        pdf_page_url = pdf_page_element.get_attribute('href')
+        pdf_relative_url = find_static_link(pdf_page_url, "//a[text()='pdf']/@href")
+        if not pdf_relative_url:
+            driver.get(pdf_page_url)
+            pdf_element = WebDriverWait(driver, 10, poll_frequency=_POLL_FREQUENCY).until(
+                EC.presence_of_element_located((By.XPATH, "//a[text()='pdf']"))
+            )
+            pdf_relative_url = pdf_element.get_attribute('href')
+        
+        # Convert relative URL to absolute URL if necessary
+        if pdf_relative_url.startswith('/'):
+            pdf_url = f"https://openaccess.thecvf.com{pdf_relative_url}"
+        else:
+            pdf_url = pdf_relative_url
+
+        return title, pdf_url
+
+    pool = get_browser_pool(browser_name)
+    drivers = []
     papers = []
     paper_count = 0
     
@@ -368,65 +809,48 @@ def scrape_cvpr(year, filter_name=None, filter_value=None, max_papers=None, brow
         if filter_name and filter_value:
             encoded_filter_value = filter_value.replace(' ', '+')
             base_url += f"?filter={filter_name}&search={encoded_filter_value}"
+        check_url_exists(base_url)
         
-        driver = setup_driver(browser_name)
+        driver = pool.acquire()
+        drivers.append(driver)
         print(f"Fetching papers from CVPR: {base_url}")
         driver.get(base_url)
-        time.sleep(10)  # Wait for dynamic content
+        # Wait for the dynamic content, i.e. until paper links have appeared and stopped being added
+        WebDriverWait(driver, 20, poll_frequency=_POLL_FREQUENCY).until(
+            EC.presence_of_element_located(_POSTER_LINK)
+        )
+        wait_for_stable_count(driver, *_POSTER_LINK)
         
         # Get all paper links from the filtered page
-        paper_elements = driver.find_elements(By.CSS_SELECTOR, "a[href*='poster/']")
-        paper_links = [elem.get_attribute('href') for elem in paper_elements if elem.get_attribute('href')]
+        paper_links = find_links(driver, 'poster/')
         print(f"Found {len(paper_links)} papers")
         
-        for paper_url in paper_links:
-            try:
-                # Get paper title and PDF link
-                driver.get(paper_url)
-                title_element = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "h2.card-title.main-title.text-center"))
-                )
-                title = title_element.text.strip() if title_element else "Unknown Title"
-                
-                try:
-                    # Try finding by link text
-                    pdf_page_element = WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located((By.XPATH, "//a[contains(text(), 'Paper PDF')]"))
-                    )
-                except Exception as e:
-                    print(f"Could not find PDF page link: {str(e)}")
+        # Each paper costs several sequential page loads, so visit them with a pool of drivers
+        for _ in range(min(num_drivers, len(paper_links)) - 1):
+            drivers.append(pool.acquire())
+
+        # Closing the generator stops the page visits before the drivers are released, also on early exits
+        with closing(_iter_paper_info(paper_links, _get_paper_info, drivers, cache_dir)) as paper_infos:
+            for paper_url, paper_info, error in paper_infos:
+                if error is not None:
+                    print(f"Error processing paper {paper_url}: {str(error)}")
+                    continue
+                if paper_info is None:
                     continue
+                title, pdf_url = paper_info
 
-                # Navigate to the paper's HTML page
-                pdf_page_url = pdf_page_element.get_attribute('href')
-                driver.get(pdf_page_url)
-                
-                # Find the actual PDF download link
-                pdf_element = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//a[text()='pdf']"))
-                )
-                pdf_relative_url = pdf_element.get_attribute('href')
-                
-                # Convert relative URL to absolute URL if necessary
-                if pdf_relative_url.startswith('/'):
-                    pdf_url = f"https://openaccess.thecvf.com{pdf_relative_url}"
-                else:
-                    pdf_url = pdf_relative_url
-                
                 # Generate paper ID and store paper info
                 paper_number = paper_url.split('/')[-1]
                 paper_id = f"CVPR{year}_{paper_number}"
-                
+            
                 papers.append((paper_id, title, pdf_url))
                 paper_count += 1
                 print(f"Found paper {paper_count}: {title}", flush=True)
-                
+                if on_paper:
+                    on_paper(paper_id, title, pdf_url)
+            
                 if max_papers and paper_count >= max_papers:
-                    return papers
-                    
-            except Exception as e:
-                print(f"Error processing paper {paper_url}: {str(e)}")
-                continue
+                    break
                 
         return papers
         
@@ -435,8 +859,5 @@ def scrape_cvpr(year, filter_name=None, filter_value=None, max_papers=None, brow
         raise
         
     finally:
-        if driver:
-            try:
-                driver.quit()
-            except Exception as e:
-                print(f"Error closing driver: {str(e)}")
\ No newline at end of file
+        for driver in drivers:
+            pool.release(driver)
\ No newline at end of file
@@ -1,9 +1,11 @@
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Iterator, Optional
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+from sqlalchemy import create_engine, event, func, tuple_, Column, Index, Integer, String, DateTime
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, column_property, Query, Session
+from sqlalchemy.schema import CreateIndex
 
 Base = declarative_base()
 
@@ -11,7 +13,7 @@ class Paper(Base):
     __tablename__ = 'Paper'
 
     id = Column(String, primary_key=True)
-    platform = Column(String)
+    platform = Column(String, index=True)
     collection = Column(String)
     title = Column(String)
 
@@ -20,46 +22,161 @@ class Paper(Base):
     content = Column(String)
     summary = Column(String)
 
+    # Whether the paper has parsed content, selectable without reading the content itself
+    has_content = column_property(content.isnot(None) & (content != ''))
+
     def __repr__(self):
         return f"<Paper(id={self.id}, title='{self.title}', platform='{self.platform}')>"
 
 
+# Papers are queried by collection, and exported sorted by title within it, so one index serves both
+Index('ix_Paper_collection_title', Paper.collection, func.lower(Paper.title), Paper.id)
+
+
+class SummaryCache(Base):
+    __tablename__ = 'SummaryCache'
+
+    # SHA-256 of the provider, model, prompt and generation parameters
+    key = Column(String(64), primary_key=True)
+    summary = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SummaryCache(key={self.key}, created_at={self.created_at})>"
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers such as the exporter run while papers are being written,
+    # and with WAL, NORMAL sync no longer fsyncs on every commit but stays consistent
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _query_columns(session: Session, columns: Optional[List[str]]) -> Query:
+    # Select only the given Paper columns as rows with attribute access, or whole Paper objects by default
+    if columns:
+        return session.query(*[getattr(Paper, column) for column in columns])
+    return session.query(Paper)
+
+
 class Database:
     def __init__(self, db_url: str):
-        self.engine = create_engine(db_url)
-        self.Session = sessionmaker(bind=self.engine)
+        self.engine = create_engine(db_url, pool_pre_ping=True)
+        if self.engine.dialect.name == 'sqlite':
+            event.listen(self.engine, 'connect', _set_sqlite_pragmas)
+        # Returned papers are used after their session is closed, so keep their loaded attributes on commit
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+
+    @contextmanager
+    def _session(self) -> Iterator[Session]:
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
 
     def create_tables(self):
         Base.metadata.create_all(self.engine)
+        # create_all skips existing tables, so add indexes introduced after a database was created.
+        # IF NOT EXISTS is used since expression indexes cannot be reflected to check for them first
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
 
     def add_entry(self, paper: Paper) -> None:
-        session = self.Session()
-        session.add(paper)
-        session.commit()
-        session.close()
+        with self._session() as session:
+            session.add(paper)
 
-    def get_papers(self, filters: Dict[str, Any] = None) -> List[Paper]:
-        session = self.Session()
-        query = session.query(Paper)
-        if filters:
-            query = query.filter_by(**filters)
-        papers = query.all()
-        session.close()
+    def add_entries(self, papers: List[Paper]) -> None:
+        with self._session() as session:
+            session.add_all(papers)
+
+    def get_papers_by_ids(self, paper_ids: List[str], batch_size: int = 500,
+                          columns: Optional[List[str]] = None) -> Dict[str, Paper]:
+        # Query in batches to stay under the bound-parameter limit of SQLite
+        if columns and 'id' not in columns:
+            columns = ['id'] + columns
+        papers = {}
+        with self._session() as session:
+            for i in range(0, len(paper_ids), batch_size):
+                batch = paper_ids[i:i + batch_size]
+                for paper in _query_columns(session, columns).filter(Paper.id.in_(batch)):
+                    papers[paper.id] = paper
         return papers
 
+    def get_papers(self, filters: Dict[str, Any] = None, columns: Optional[List[str]] = None) -> List[Paper]:
+        with self._session() as session:
+            query = _query_columns(session, columns)
+            if filters:
+                query = query.filter_by(**filters)
+            return query.all()
+
+    def iter_papers(self, filters: Dict[str, Any] = None, order_by_title: bool = False, batch_size: int = 500,
+                    columns: Optional[List[str]] = None) -> Iterator[Paper]:
+        # Stream rows in batches instead of loading the whole result set into memory. Each batch is read in its
+        # own short transaction, paging by the sort key, so no read transaction stays open while the caller works
+        # through the papers, which would keep SQLite from checkpointing its WAL or pin an old PostgreSQL snapshot
+        sort_key = (func.lower(Paper.title), Paper.id) if order_by_title else (Paper.id,)
+        last_key = None
+        while True:
+            with self._session() as session:
+                keys = session.query(*sort_key)
+                if filters:
+                    keys = keys.filter_by(**filters)
+                if last_key is not None:
+                    keys = keys.filter(tuple_(*sort_key) > tuple_(*last_key))
+                keys = keys.order_by(*sort_key).limit(batch_size).all()
+                if not keys:
+                    return
+                last_key = tuple(keys[-1])
+                batch = _query_columns(session, columns).filter(Paper.id.in_([key[-1] for key in keys]))
+                batch = batch.order_by(*sort_key).all()
+            yield from batch
+
     def update_paper(self, paper_id: str, updates: Dict[str, Any]) -> None:
-        session = self.Session()
-        paper = session.query(Paper).filter_by(id=paper_id).first()
-        if paper:
-            for key, value in updates.items():
-                setattr(paper, key, value)
-            session.commit()
-        session.close()
+        with self._session() as session:
+            paper = session.query(Paper).filter_by(id=paper_id).first()
+            if paper:
+                for key, value in updates.items():
+                    setattr(paper, key, value)
+
+    def update_papers(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        # Apply the updates of many papers, keyed by paper ID, in one transaction
+        with self._session() as session:
+            session.bulk_update_mappings(Paper, [{'id': paper_id, **values} for paper_id, values in updates.items()])
+
+    def get_cached_summary(self, key: str) -> Optional[str]:
+        with self._session() as session:
+            return session.query(SummaryCache.summary).filter_by(key=key).scalar()
+
+    def cache_summary(self, key: str, summary: str) -> None:
+        with self._session() as session:
+            # Replace an existing entry, e.g. when summaries are regenerated with enforce_resummary
+            session.merge(SummaryCache(key=key, summary=summary, created_at=datetime.utcnow()))
+
+    def cache_summaries(self, summaries: Dict[str, str]) -> None:
+        # Store many summaries, keyed by cache key, in one transaction
+        created_at = datetime.utcnow()
+        with self._session() as session:
+            for key, summary in summaries.items():
+                session.merge(SummaryCache(key=key, summary=summary, created_at=created_at))
 
     def delete_paper(self, paper_id: str) -> None:
-        session = self.Session()
-        paper = session.query(Paper).filter_by(id=paper_id).first()
-        if paper:
-            session.delete(paper)
-            session.commit()
-        session.close()
+        with self._session() as session:
+            paper = session.query(Paper).filter_by(id=paper_id).first()
+            if paper:
+                session.delete(paper)
+
+    def delete_papers(self, paper_ids: List[str], batch_size: int = 500) -> None:
+        # Delete in batches to stay under the bound-parameter limit of SQLite, all in one transaction
+        with self._session() as session:
+            for i in range(0, len(paper_ids), batch_size):
+                batch = paper_ids[i:i + batch_size]
+                session.query(Paper).filter(Paper.id.in_(batch)).delete(synchronize_session=False)
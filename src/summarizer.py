@@ -1,22 +1,124 @@
+import functools
+import importlib.util
+import json
+import threading
+import time
+
 import torch
-from transformers import pipeline
-from openai import OpenAI
-from anthropic import Anthropic
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from transformers import pipeline, AutoTokenizer, BitsAndBytesConfig
+from openai import OpenAI, APIConnectionError as OpenAIConnectionError, APIStatusError as OpenAIStatusError
+from anthropic import Anthropic, APIConnectionError as AnthropicConnectionError, APIStatusError as AnthropicStatusError
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception
+
+# tiktoken counts OpenAI tokens exactly, without it their number is estimated from the text length
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Rough number of characters per token of English text, for models without a local tokenizer
+_CHARS_PER_TOKEN = 4
+
+# Loaded pipelines by model name and loading options, so each model is loaded once per process
+_MODEL_CACHE = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+
+# Request timeouts, conflicts and rate limiting may succeed when retried, like server errors (5xx)
+_RETRYABLE_STATUS = {408, 409, 429}
+
+# Options of how a request is sent rather than what is generated, which batched requests do not accept
+TRANSPORT_PARAMS = ("stream", "stream_options", "timeout", "extra_headers", "extra_query")
+
+
+def _is_retryable(error):
+    """Check whether an API error is transient, i.e. a connection failure or timeout, rate limiting or a server error."""
+    if isinstance(error, (OpenAIConnectionError, AnthropicConnectionError)):
+        return True
+    if isinstance(error, (OpenAIStatusError, AnthropicStatusError)):
+        return error.status_code in _RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def get_quantization_config(quantization, cpu_offload=False):
+    """
+    Build the bitsandbytes config for loading a model with quantized weights.
+    
+    Args:
+    quantization (str): "8bit", "4bit", or None / "none" to load the weights unquantized.
+    cpu_offload (bool): Whether layers that do not fit on the GPU are kept on the CPU.
+
+    Returns:
+    BitsAndBytesConfig: The quantization config, None if the weights are not quantized.
+    """
+    if quantization in (None, "none"):
+        return None
+    if quantization not in ("8bit", "4bit"):
+        raise ValueError(f"Unsupported quantization: {quantization}")
+    if importlib.util.find_spec("bitsandbytes") is None:
+        raise ImportError(f"{quantization} quantization requires the bitsandbytes package")
+    if quantization == "8bit":
+        # Offloaded layers stay unquantized in float32 on the CPU, which bitsandbytes refuses unless enabled
+        return BitsAndBytesConfig(load_in_8bit=True, llm_int8_enable_fp32_cpu_offload=cpu_offload)
+    # Decoding is bound by memory bandwidth, so 4-bit NF4 weights also speed up generation
+    return BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_quant_type="nf4",
+        bnb_4bit_compute_dtype=torch.bfloat16,
+        bnb_4bit_use_double_quant=True,
+    )
 
 
-def load_model(model_name):
+def load_model(model_name, quantization=None, model_kwargs=None):
     """
-    Load a designated open-source LLM from Hugging Face using pipeline.
+    Load a designated open-source LLM from Hugging Face using pipeline, reusing it if already loaded.
     
     Args:
     model_name (str): The name of the model on Hugging Face.
-    cache_dir (str): The directory to cache the model.
+    quantization (str): "8bit" or "4bit" to load quantized weights with bitsandbytes (default: unquantized).
+    model_kwargs (dict): Extra arguments for loading the model, e.g. attn_implementation, or max_memory and
+        offload_folder to offload layers that do not fit into GPU memory (optional).
 
     Returns:
     pipeline: The loaded model pipeline for text generation.
     """
-    return pipeline("text-generation", model=model_name, device_map="auto")
+    model_kwargs = dict(model_kwargs or {})
+    key = (model_name, quantization, repr(sorted(model_kwargs.items())))
+    # Hold the lock while loading, so concurrent callers wait for one load instead of each loading the model
+    with _MODEL_CACHE_LOCK:
+        if key not in _MODEL_CACHE:
+            # Keep the checkpoint's half-precision weights instead of upcasting them to float32,
+            # halving the memory read per generated token
+            model_kwargs.setdefault("torch_dtype", "auto")
+            # Without flash-attn, PyTorch's fused SDPA attention is the fastest built-in implementation
+            if model_kwargs.get("attn_implementation") == "flash_attention_2" and \
+                    importlib.util.find_spec("flash_attn") is None:
+                print("flash_attn is not installed, falling back to SDPA attention")
+                model_kwargs["attn_implementation"] = "sdpa"
+            # Limiting GPU memory makes device_map="auto" place the remaining layers on the CPU and disk
+            cpu_offload = "max_memory" in model_kwargs or "offload_folder" in model_kwargs
+            if cpu_offload:
+                model_kwargs.setdefault("offload_state_dict", True)
+            quantization_config = get_quantization_config(quantization, cpu_offload=cpu_offload)
+            if quantization_config is not None:
+                model_kwargs["quantization_config"] = quantization_config
+            _MODEL_CACHE[key] = pipeline("text-generation", model=model_name, device_map="auto",
+                                         model_kwargs=model_kwargs)
+        return _MODEL_CACHE[key]
+
+
+def unload_model(model_name=None):
+    """
+    Release loaded model pipelines and the GPU memory they hold.
+    
+    Args:
+    model_name (str): The name of the model to unload (default: all loaded models).
+    """
+    with _MODEL_CACHE_LOCK:
+        for key in [key for key in _MODEL_CACHE if model_name is None or key[0] == model_name]:
+            del _MODEL_CACHE[key]
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
 
 
 def generate_summary_hf(model_pipeline, prompt, **kwargs):
@@ -38,36 +140,89 @@ def generate_summary_hf(model_pipeline, prompt, **kwargs):
     return summary
 
 
-def generate_summary_openai(prompt, engine, **kwargs):
-    """Generate a summary using OpenAI's API with retry logic for rate limits."""
-    openai = OpenAI()
+def generate_summaries_hf(model_pipeline, prompts, batch_size=8, **kwargs):
+    """
+    Generate summaries for several prompts, running them through the model in batches.
+    
+    Args:
+    model_pipeline: The loaded language model pipeline.
+    prompts (list): The input prompts for summarization.
+    batch_size (int): Number of prompts generated together in one forward pass.
+    
+    Returns:
+    list: The generated summaries, in the order of the prompts.
+    """
+    tokenizer = model_pipeline.tokenizer
+    # Batched prompts are padded to the same length, on the left so generation continues right after each prompt
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+
+    outputs = model_pipeline(prompts, batch_size=batch_size, **kwargs)
+    # Extract only the answers (summaries) by removing the original prompts
+    return [output[0]['generated_text'][len(prompt):].strip() for prompt, output in zip(prompts, outputs)]
+
+
+@functools.lru_cache(maxsize=1)
+def get_openai_client():
+    """Create the OpenAI client once, so all calls share its pooled keep-alive connections."""
+    return OpenAI()
+
+
+@functools.lru_cache(maxsize=1)
+def get_anthropic_client():
+    """Create the Anthropic client once, so all calls share its pooled keep-alive connections."""
+    return Anthropic()
+
+
+def generate_summary_openai(prompt, engine, stream=False, **kwargs):
+    """
+    Generate a summary using OpenAI's API with retry logic for rate limits.
+    With stream=True, the summary is received incrementally, so long generations do not hit request timeouts.
+    """
+    openai = get_openai_client()
     
     @retry(
-        retry=retry_if_exception_type(Exception),
-        wait=wait_exponential(multiplier=1, min=4, max=60),
-        stop=stop_after_attempt(5)
+        retry=retry_if_exception(_is_retryable),
+        wait=wait_random_exponential(multiplier=1, max=60),
+        stop=stop_after_attempt(5),
+        reraise=True
     )
     def _generate_with_retry():
         chat_completion = openai.chat.completions.create(
             model=engine,
             messages=[{"role": "user", "content": prompt}],
+            stream=stream,
             **kwargs
         )
+        if stream:
+            return "".join(chunk.choices[0].delta.content or "" for chunk in chat_completion if chunk.choices).strip()
         return chat_completion.choices[0].message.content.strip()
         
     return _generate_with_retry()
 
 
-def generate_summary_claude(prompt, engine, **kwargs):
-    """Generate a summary using Claude's API with retry logic for rate limits."""
-    anthropic = Anthropic()
+def generate_summary_claude(prompt, engine, stream=False, **kwargs):
+    """
+    Generate a summary using Claude's API with retry logic for rate limits, the prompt being a string or content blocks.
+    With stream=True, the summary is received incrementally, so long generations do not hit request timeouts.
+    """
+    anthropic = get_anthropic_client()
     
     @retry(
-        retry=retry_if_exception_type(Exception),
-        wait=wait_exponential(multiplier=1, min=4, max=60),
-        stop=stop_after_attempt(5)
+        retry=retry_if_exception(_is_retryable),
+        wait=wait_random_exponential(multiplier=1, max=60),
+        stop=stop_after_attempt(5),
+        reraise=True
     )
     def _generate_with_retry():
+        if stream:
+            with anthropic.messages.stream(
+                model=engine,
+                messages=[{"role": "user", "content": prompt}],
+                **kwargs
+            ) as response:
+                return "".join(response.text_stream).strip()
         response = anthropic.messages.create(
             model=engine,
             messages=[{"role": "user", "content": prompt}],
@@ -77,26 +232,180 @@ def generate_summary_claude(prompt, engine, **kwargs):
         
     return _generate_with_retry()
 
-def summarize_text(prefix, suffix, text, provider, model_name, **kwargs):
+
+def generate_summaries_openai_batch(prompts, engine, poll_interval=60, **kwargs):
+    """
+    Generate summaries using OpenAI's Batch API, which costs half as much as regular requests
+    but may take up to 24 hours to complete.
+    
+    Args:
+    prompts (list): The input prompts for summarization.
+    engine (str): The name of the model to use.
+    poll_interval (int): Seconds between checks whether the batch has finished.
+    
+    Returns:
+    list: The generated summaries in the order of the prompts, None for requests that failed.
+    """
+    openai = get_openai_client()
+    kwargs = {key: value for key, value in kwargs.items() if key not in TRANSPORT_PARAMS}
+    lines = "\n".join(
+        json.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": engine, "messages": [{"role": "user", "content": prompt}], **kwargs},
+        })
+        for i, prompt in enumerate(prompts)
+    )
+    input_file = openai.files.create(file=("summaries.jsonl", lines.encode("utf-8")), purpose="batch")
+    batch = openai.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions",
+                                  completion_window="24h")
+    print(f"Submitted OpenAI batch {batch.id} with {len(prompts)} requests", flush=True)
+
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(poll_interval)
+        batch = openai.batches.retrieve(batch.id)
+    # Expired and cancelled batches still return the requests that finished in time
+    if not batch.output_file_id:
+        raise RuntimeError(f"OpenAI batch {batch.id} {batch.status} without results")
+
+    summaries = [None] * len(prompts)
+    for line in openai.files.content(batch.output_file_id).text.splitlines():
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if response.get("status_code") == 200:
+            summaries[int(result["custom_id"])] = response["body"]["choices"][0]["message"]["content"].strip()
+    return summaries
+
+
+@functools.lru_cache(maxsize=4)
+def get_tokenizer(provider, model_name):
+    """
+    Get a tokenizer for a model, None if its tokens cannot be counted locally.
+    
+    Args:
+    provider (str): The provider of the model (e.g., "openai", "claude", "hf").
+    model_name (str): The name of the model.
+    
+    Returns:
+    tuple: Functions encoding a text into tokens and decoding tokens back into text, None if not available.
+    """
+    if provider.lower() == "hf":
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        return lambda text: tokenizer.encode(text, add_special_tokens=False), tokenizer.decode
+    if provider.lower() == "openai" and tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return encoding.encode, encoding.decode
+    return None
+
+
+def truncate_text(text, max_tokens, provider, model_name):
+    """
+    Truncate a text to at most a number of the model's tokens, keeping its beginning.
+    
+    Args:
+    text (str): The text to truncate.
+    max_tokens (int): Maximum number of tokens to keep.
+    provider (str): The provider of the model (e.g., "openai", "claude", "hf").
+    model_name (str): The name of the model.
+    
+    Returns:
+    str: The truncated text.
+    """
+    # A token spans at least one character, so shorter texts do not need to be tokenized
+    if len(text) <= max_tokens:
+        return text
+    tokenizer = get_tokenizer(provider, model_name)
+    if tokenizer is None:
+        return text[:max_tokens * _CHARS_PER_TOKEN]
+    encode, decode = tokenizer
+    tokens = encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return decode(tokens[:max_tokens])
+
+
+def build_prompt(prefix, text, suffix):
+    """Build the prompt fed into the model from the configured prefix and suffix around the text."""
+    return f"{prefix}\n\n{text}\n\n{suffix}"
+
+
+def build_claude_content(prefix, text, suffix):
+    """
+    Build the prompt as Claude content blocks, marking the prefix shared by all papers for prompt caching.
+    
+    Args:
+    prefix (str): The instructions placed before the text.
+    text (str): The text to summarize.
+    suffix (str): The instructions placed after the text.
+    
+    Returns:
+    list: The content blocks, together reading the same as build_prompt.
+    """
+    if not prefix:
+        return build_prompt(prefix, text, suffix)
+    # Only a prompt's leading blocks can be cached, so the paper and everything after it are sent uncached
+    return [
+        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": f"\n\n{text}\n\n{suffix}"},
+    ]
+
+
+def summarize_text(prefix, suffix, text, provider, model_name, quantization=None, model_kwargs=None, **kwargs):
     """
     Main function to summarize text using a specified model or API.
     
     Args:
     text (str): The text to summarize.
-    provider (str): The provider of the model (e.g., "openai", "claude", "hf").
+    provider (str): The provider of the model (e.g., "openai", "claude" or "anthropic", "hf").
     model_name (str): The name of the model to use (e.g., "facebook/opt-350m", "chatgpt-4o").
+    quantization (str): "8bit" or "4bit" to load a Hugging Face model with quantized weights (optional).
+    model_kwargs (dict): Extra arguments for loading a Hugging Face model, e.g. attn_implementation (optional).
     
     Returns:
     str: The generated summary.
     """
-    prompt = f"{prefix}\n\n{text}\n\n{suffix}"
+    prompt = build_prompt(prefix, text, suffix)
     
     if provider.lower() == "openai":
         return generate_summary_openai(prompt, model_name, **kwargs)
-    elif provider.lower() == "claude":
-        return generate_summary_claude(prompt, model_name, **kwargs)
+    elif provider.lower() in ("claude", "anthropic"):
+        return generate_summary_claude(build_claude_content(prefix, text, suffix), model_name, **kwargs)
     elif provider.lower() == "hf":
-        model_pipeline = load_model(model_name)
+        model_pipeline = load_model(model_name, quantization=quantization, model_kwargs=model_kwargs)
         return generate_summary_hf(model_pipeline, prompt, **kwargs)
     else:
         raise ValueError(f"Unsupported provider: {provider}")
+
+
+def summarize_texts(prefix, suffix, texts, provider, model_name, quantization=None, model_kwargs=None, batch_size=8,
+                    openai_batch=False, **kwargs):
+    """
+    Summarize several texts, batching them on local models.
+    
+    Args:
+    texts (list): The texts to summarize.
+    provider (str): The provider of the model (e.g., "openai", "claude", "hf").
+    model_name (str): The name of the model to use (e.g., "facebook/opt-350m", "chatgpt-4o").
+    quantization (str): "8bit" or "4bit" to load a Hugging Face model with quantized weights (optional).
+    model_kwargs (dict): Extra arguments for loading a Hugging Face model, e.g. attn_implementation (optional).
+    batch_size (int): Number of texts a Hugging Face model summarizes in one forward pass.
+    openai_batch (bool): Whether OpenAI models summarize the texts in one job of the Batch API.
+    
+    Returns:
+    list: The generated summaries in the order of the texts, None for texts the Batch API failed to summarize.
+    """
+    if provider.lower() == "openai" and openai_batch:
+        prompts = [build_prompt(prefix, text, suffix) for text in texts]
+        return generate_summaries_openai_batch(prompts, model_name, **kwargs)
+
+    if provider.lower() != "hf":
+        # API requests take a single prompt each
+        return [summarize_text(prefix, suffix, text, provider, model_name, **kwargs) for text in texts]
+
+    model_pipeline = load_model(model_name, quantization=quantization, model_kwargs=model_kwargs)
+    prompts = [build_prompt(prefix, text, suffix) for text in texts]
+    return generate_summaries_hf(model_pipeline, prompts, batch_size=batch_size, **kwargs)